@@ -0,0 +1,122 @@
+"""Activation of the blanket layers from the tallied neutron spectra.
+
+The transport run records the VITAMIN-J-175 neutron spectrum of every layer
+(the 'neutron_spectra' tally). LayerActivation collapses the reaction rates of
+each layer material with its own spectrum once, through openmc.deplete's
+independent operator, and can then solve any number of irradiation and
+cooling schedules without running transport again.
+
+    activation = LayerActivation.from_statepoint('statepoint.240.h5', cache_dir='micro_xs')
+    rate = neutron_source_rate(500e6)  # from openmc_model
+    results = activation.solve([3600] * 24 + [86400] * 30, [rate] * 24 + [0] * 30, 'schedule_a')
+"""
+import hashlib
+import os
+
+import numpy as np
+import openmc
+import openmc.deplete
+
+from blanket import as_blanket, layer_volumes
+from openmc_model import DEFAULT_PARAMS, R_major, build_model_parts, r_minor
+from tally_builder import SPECTRA_GROUP_STRUCTURE
+
+
+class LayerActivation:
+    """Depletion of the layer materials under fixed, pre-collapsed reaction rates.
+
+    `materials` are per-layer copies of the layer materials (with volumes),
+    `fluxes` the total neutron flux of each layer in n-cm per source particle
+    and `micros` the one-group openmc.deplete.MicroXS of each layer.
+    """
+
+    def __init__(self, materials, fluxes, micros, chain_file=None):
+        if not len(materials) == len(fluxes) == len(micros):
+            raise ValueError('materials, fluxes and micros need one entry per layer')
+        self.materials = list(materials)
+        self.fluxes = [np.atleast_1d(np.asarray(flux, dtype=float)) for flux in fluxes]
+        self.micros = list(micros)
+        self.chain_file = chain_file
+
+    @property
+    def layers(self):
+        return [material.name for material in self.materials]
+
+    @classmethod
+    def from_statepoint(cls, statepoint_path, layers=None, chain_file=None, cache_dir=None, **params):
+        """Collapses the reaction rates of each layer from a finished transport run.
+
+        `params` are the build_model() parameters of the run; `layers`
+        restricts the activation to some of the layers (default: all). With a
+        `cache_dir`, the collapsed cross sections are stored there and reused
+        as long as the spectrum, temperature and chain are unchanged.
+        """
+        parts = build_model_parts(**params)
+        index = parts.indices['neutron_spectra']
+        with openmc.StatePoint(statepoint_path) as sp:
+            spectra = index.get(sp, particle='neutron', score='flux')
+
+        blanket = as_blanket(params.get('blanket', DEFAULT_PARAMS['blanket']))
+        volumes = dict(zip([layer.name for layer in blanket], layer_volumes(blanket, R_major, r_minor)))
+        energies = openmc.mgxs.GROUP_STRUCTURES[SPECTRA_GROUP_STRUCTURE]
+        if chain_file is None:
+            chain_file = openmc.config['chain_file']
+
+        materials, fluxes, micros = [], [], []
+        for i, layer in enumerate(index.labels('layer')):
+            if layers is not None and layer not in layers:
+                continue
+            material = parts.layer_cells[layer].fill.clone()
+            material.name = layer
+            material.volume = volumes[layer]
+            material.depletable = True
+            micros.append(_collapse(material, energies, spectra[i], chain_file, cache_dir))
+            materials.append(material)
+            fluxes.append(spectra[i].sum())
+        return cls(materials, fluxes, micros, chain_file)
+
+    def solve(self, timesteps, source_rates, directory, timestep_units='s',
+              integrator=openmc.deplete.PredictorIntegrator):
+        """Depletes every layer through a schedule and returns the openmc.deplete.Results.
+
+        `timesteps` and `source_rates` (n/s, 0 for cooling) follow
+        openmc.deplete.Integrator; the results are written to `directory`.
+        Since the reaction rates are fixed, the predictor integrator is exact
+        up to the matrix exponential.
+        """
+        operator = openmc.deplete.IndependentOperator(
+            openmc.Materials(self.materials), self.fluxes, self.micros,
+            chain_file=self.chain_file, normalization_mode='source-rate')
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, 'depletion_results.h5')
+        integrator(operator, timesteps, source_rates=source_rates, timestep_units=timestep_units).integrate(path=path)
+        return openmc.deplete.Results(path)
+
+    def summary(self, results, units='W'):
+        """Returns {layer: (times in s, activity in Bq, decay heat in `units`)} from solve() results."""
+        summary = {}
+        for material in self.materials:
+            times, activity = results.get_activity(material, units='Bq')
+            _, decay_heat = results.get_decay_heat(material, units=units)
+            summary[material.name] = (times, activity, decay_heat)
+        return summary
+
+
+def _collapse(material, energies, spectrum, chain_file, cache_dir):
+    """One-group cross sections of `material` weighted with `spectrum`, cached on disk."""
+    path = None
+    if cache_dir is not None:
+        key = hashlib.sha256()
+        key.update(np.asarray(spectrum, dtype=float).tobytes())
+        key.update(f'{material.temperature}:{os.path.abspath(chain_file)}'.encode())
+        path = os.path.join(cache_dir, f'{material.name}-{key.hexdigest()[:16]}.csv')
+        if os.path.exists(path):
+            return openmc.deplete.MicroXS.from_csv(path)
+
+    micro = openmc.deplete.MicroXS.from_multigroup_flux(
+        energies=energies, multigroup_flux=spectrum, chain_file=chain_file,
+        temperature=material.temperature)
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        micro.to_csv(path)
+    return micro
@@ -0,0 +1,47 @@
+"""Shared helpers for the benchmark scripts."""
+import os
+import sys
+import time
+
+# the benchmarks live one level below the model scripts
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+
+def run_case(model, directory, threads=None):
+    """Runs `model` in `directory` and returns its throughput and output size."""
+    os.makedirs(directory, exist_ok=True)
+    start = time.perf_counter()
+    statepoint_path = model.run(cwd=directory, threads=threads, output=False)
+    wall_time = time.perf_counter() - start
+    return statepoint_metrics(statepoint_path, model, wall_time)
+
+
+def statepoint_metrics(statepoint_path, model, wall_time):
+    """Returns the throughput, timings and output size of a finished run of `model`."""
+    import openmc
+
+    settings = model.settings
+    active_batches = settings.batches - (settings.inactive or 0)
+    with openmc.StatePoint(statepoint_path) as sp:
+        runtime = dict(sp.runtime)
+    active_time = runtime.get('active batches', runtime.get('transport', wall_time))
+    return {
+        'particles_per_second': settings.particles * active_batches / active_time,
+        'initialization_time': runtime.get('total initialization'),
+        'tally_reduction_time': runtime.get('accumulating tallies'),
+        'wall_time': wall_time,
+        'n_tallies': len(model.tallies),
+        'statepoint_bytes': os.path.getsize(statepoint_path),
+        'statepoint': str(statepoint_path),
+    }
+
+
+def print_table(rows, columns):
+    widths = [max(len(column), *(len(f'{row[column]:.4g}' if isinstance(row[column], float) else str(row[column]))
+                                  for row in rows)) for column in columns]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        cells = [f'{row[column]:.4g}' if isinstance(row[column], float) else str(row[column]) for column in columns]
+        print('  '.join(cell.ljust(width) for cell, width in zip(cells, widths)))
@@ -0,0 +1,54 @@
+"""Checks that importing the model is cheap and side-effect free.
+
+Imports openmc_model in a fresh interpreter inside an empty directory, then
+reports the import time and fails if any file was written or if OpenMC
+(or matplotlib) was loaded by the import alone.
+
+    python benchmarks/bench_import.py --max-seconds 0.5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from _common import REPO_DIR
+
+_PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import openmc_model
+elapsed = time.perf_counter() - start
+heavy = sorted(name for name in ('openmc', 'matplotlib') if name in sys.modules)
+print(json.dumps({'import_seconds': elapsed, 'heavy_modules': heavy}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-seconds', type=float, default=0.5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [REPO_DIR, os.environ.get('PYTHONPATH')])),
+               'PYTHONDONTWRITEBYTECODE': '1'}
+        output = subprocess.run([sys.executable, '-c', _PROBE], cwd=tmp, env=env, check=True,
+                                capture_output=True, text=True).stdout
+        result = json.loads(output)
+        result['created_files'] = sorted(os.listdir(tmp))
+
+    print(json.dumps(result, indent=2))
+    failures = []
+    if result['created_files']:
+        failures.append(f"import created files: {result['created_files']}")
+    if result['heavy_modules']:
+        failures.append(f"import loaded {result['heavy_modules']}")
+    if result['import_seconds'] > args.max_seconds:
+        failures.append(f"import took {result['import_seconds']:.3f} s (limit {args.max_seconds} s)")
+    if failures:
+        sys.exit('\n'.join(failures))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Compares OpenMC initialization with the full and the reduced nuclear-data library.
+
+Initializes the model through openmc.lib in a fresh interpreter for each
+library and reports the initialization time and peak resident memory.
+
+    python benchmarks/bench_nuclear_data.py /path/to/endfb-viii.0-hdf5/cross_sections.xml
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from _common import print_table
+
+_PROBE = '''
+import json, resource, time
+import openmc.lib
+start = time.perf_counter()
+openmc.lib.init(['-s', '1'], output=False)
+elapsed = time.perf_counter() - start
+openmc.lib.finalize()
+print(json.dumps({'init_seconds': elapsed, 'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+'''
+
+
+def measure_init(model, directory):
+    """Initializes `model` in a fresh interpreter and returns its init time and peak RSS."""
+    model.export_to_xml(directory)
+    output = subprocess.run([sys.executable, '-c', _PROBE], cwd=directory, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('source', help='cross_sections.xml of the full library')
+    parser.add_argument('--reduced', help='cross_sections.xml of the reduced library (default: write one)')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    from nuclear_data import write_reduced_library
+    from openmc_model import build_model
+
+    with tempfile.TemporaryDirectory() as tmp:
+        reduced = args.reduced
+        if reduced is None:
+            reduced = write_reduced_library(build_model(cross_sections=args.source), args.source,
+                                            os.path.join(tmp, 'reduced'))
+        rows = []
+        for library, path in (('full', args.source), ('reduced', reduced)):
+            run_dir = os.path.join(tmp, library)
+            os.makedirs(run_dir)
+            row = measure_init(build_model(cross_sections=os.path.abspath(path)), run_dir)
+            row['library'] = library
+            rows.append(row)
+
+    print_table(rows, ['library', 'init_seconds', 'max_rss_mb'])
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(rows, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Compares source-sampling throughput of the ring, composite and tabulated plasma sources.
+
+For the tabulated source it times the alias-table construction and NumPy
+sampling. Then, for each source definition, it times the Python-side
+construction and XML export, and the source sampling inside OpenMC
+(openmc.lib.sample_external_source) in a fresh interpreter:
+
+- ring: the model's default ring source
+- composite: one openmc.Source per emitting (R, Z) cell of the same table
+- file: the source file written by plasma_source.py
+
+    python benchmarks/bench_plasma_source.py --bins 40 --samples 1000000
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import print_table
+
+_PROBE = '''
+import json, sys, time
+import openmc.lib
+openmc.lib.init(['-s', '1'], output=False)
+n = int(sys.argv[1])
+start = time.perf_counter()
+openmc.lib.sample_external_source(n)
+elapsed = time.perf_counter() - start
+openmc.lib.finalize()
+print(json.dumps({'openmc_samples_per_second': n / elapsed}))
+'''
+
+
+def composite_source(table):
+    """Returns one openmc.Source per emitting cell of `table`, weighted by its emission."""
+    import openmc
+
+    sources = []
+    for i in range(len(table.r_edges) - 1):
+        for j in range(len(table.z_edges) - 1):
+            if table.emission[i, j] <= 0:
+                continue
+            source = openmc.Source()
+            source.space = openmc.stats.CylindricalIndependent(
+                r=openmc.stats.PowerLaw(table.r_edges[i], table.r_edges[i + 1], 1),
+                phi=openmc.stats.Uniform(0, 2 * math.pi),
+                z=openmc.stats.Uniform(table.z_edges[j], table.z_edges[j + 1]))
+            source.angle = openmc.stats.Isotropic()
+            source.energy = openmc.stats.muir(e0=14080000.0, m_rat=5.0, kt=table.temperature[i, j] * 1e3)
+            source.strength = table.emission[i, j]
+            sources.append(source)
+    return sources
+
+
+def measure_sampling(model, directory, samples):
+    """Exports `model` and samples its source in a fresh interpreter; returns export time and rate."""
+    start = time.perf_counter()
+    model.export_to_xml(directory)
+    export_time = time.perf_counter() - start
+    output = subprocess.run([sys.executable, '-c', _PROBE, str(samples)], cwd=directory, check=True,
+                            capture_output=True, text=True).stdout
+    return {'export_seconds': export_time, **json.loads(output.strip().splitlines()[-1])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bins', type=int, default=40, help='R and Z bins of the emission table')
+    parser.add_argument('--samples', type=int, default=1000000)
+    parser.add_argument('--density', type=float, default=1e20, help='central ion density (m-3)')
+    parser.add_argument('--temperature', type=float, default=15.0, help='central ion temperature (keV)')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    from openmc_model import model_copy
+    from plasma_source import alias_table, emission_table, parabolic_profile, sample, write_source
+
+    table = emission_table(parabolic_profile(args.density, args.temperature), args.bins, args.bins)
+    start = time.perf_counter()
+    alias = alias_table(table.emission)
+    alias_time = time.perf_counter() - start
+    start = time.perf_counter()
+    sample(table, args.samples, alias=alias)
+    numpy_rate = args.samples / (time.perf_counter() - start)
+    print(f'alias table: {alias_time:.4g} s, NumPy sampling: {numpy_rate:.4g} samples/s')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path = os.path.join(tmp, 'plasma.h5')
+        start = time.perf_counter()
+        write_source(source_path, table, args.samples)
+        file_time = time.perf_counter() - start
+
+        rows = []
+        for name in ('ring', 'composite', 'file'):
+            start = time.perf_counter()
+            if name == 'ring':
+                model = model_copy()
+            elif name == 'composite':
+                model = model_copy()
+                model.settings.source = composite_source(table)
+            else:
+                model = model_copy(source_file=source_path)
+            build_time = time.perf_counter() - start + (file_time if name == 'file' else 0.0)
+
+            run_dir = os.path.join(tmp, name)
+            os.makedirs(run_dir)
+            row = measure_sampling(model, run_dir, args.samples)
+            row.update(source=name, n_sources=len(model.settings.source), build_seconds=build_time)
+            rows.append(row)
+
+    print_table(rows, ['source', 'n_sources', 'build_seconds', 'export_seconds', 'openmc_samples_per_second'])
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump({'alias_seconds': alias_time, 'numpy_samples_per_second': numpy_rate, 'cases': rows},
+                      fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""Thread and MPI scaling of the model, with a JSON report comparable across commits.
+
+Runs the model at a reduced particle budget through the openmc executable:
+
+- the reference configuration (all tallies, photon transport) for every
+  thread count in --threads, and for every rank count in --ranks through
+  --mpiexec (with --threads-per-rank threads each);
+- variants at the largest thread count: fewer tallies (no spectra, no
+  tallies at all), the legacy one-tally-per-bin heating layout, and
+  photon transport off.
+
+Each case records particles/s over the active batches, initialization and
+tally-reduction ('accumulating tallies') time, peak RSS of the largest
+process and statepoint size. With --compare, the throughput of every case
+is compared with an earlier report and the script fails when one dropped
+by more than --tolerance.
+
+    python benchmarks/bench_scaling.py --threads 1,2,4,8 --output scaling.json
+    python benchmarks/bench_scaling.py --threads 1,2,4,8 --compare scaling.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import REPO_DIR, print_table, statepoint_metrics
+
+# fields that identify a case across reports
+CASE_KEY = ('tallies', 'photon_transport', 'ranks', 'threads')
+
+
+def variant_model(tallies, photon_transport, particles, batches):
+    """Returns a copy of the model with the given tally set and photon transport."""
+    import openmc
+    from openmc_model import build_model_parts, model_copy
+    from tally_builder import build_legacy_heating_tallies
+
+    params = {'particles': particles, 'batches': batches, 'photon_transport': photon_transport}
+    parts = build_model_parts(**params)
+    model = model_copy(**params)
+    if tallies == 'no_spectra':
+        model.tallies = openmc.Tallies([t for t in model.tallies if t.name != parts.indices['neutron_spectra'].name])
+    elif tallies == 'none':
+        model.tallies = openmc.Tallies()
+    elif tallies == 'legacy':
+        packed = [t for t in model.tallies if t.name != parts.indices['heating'].name]
+        model.tallies = openmc.Tallies(packed + build_legacy_heating_tallies(parts.layer_cells))
+    elif tallies != 'all':
+        raise ValueError(f'unknown tally set {tallies!r}')
+    return model
+
+
+def run_executable(model, directory, threads, ranks=None, openmc_exec='openmc', mpiexec='mpiexec'):
+    """Runs `model` through the openmc executable and returns its metrics and peak RSS."""
+    os.makedirs(directory, exist_ok=True)
+    model.export_to_xml(directory)
+    command = [openmc_exec, '-s', str(threads)]
+    if ranks is not None:
+        command = [mpiexec, '-n', str(ranks), *command]
+
+    start = time.perf_counter()
+    with open(os.path.join(directory, 'output.txt'), 'w') as log:
+        process = subprocess.Popen(command, cwd=directory, stdout=log, stderr=subprocess.STDOUT)
+        # wait4 gives the resource usage of the run itself; ru_maxrss is in KiB on Linux
+        _, status, usage = os.wait4(process.pid, 0)
+    wall_time = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+    statepoint_path = os.path.join(directory, f'statepoint.{model.settings.batches}.h5')
+    metrics = statepoint_metrics(statepoint_path, model, wall_time)
+    metrics['peak_rss_mb'] = usage.ru_maxrss / 1024
+    return metrics
+
+
+def compare(report, baseline, tolerance):
+    """Prints the throughput of `report` relative to `baseline`; returns the regressed cases."""
+    previous = {tuple(case[field] for field in CASE_KEY): case for case in baseline['cases']}
+    rows, regressions = [], []
+    for case in report['cases']:
+        key = tuple(case[field] for field in CASE_KEY)
+        if key not in previous:
+            continue
+        ratio = case['particles_per_second'] / previous[key]['particles_per_second']
+        row = {**dict(zip(CASE_KEY, key)), 'ratio': ratio}
+        rows.append(row)
+        if ratio < 1 - tolerance:
+            regressions.append(row)
+    print(f'compared with {baseline["commit"]}:')
+    print_table(rows, [*CASE_KEY, 'ratio'])
+    return regressions
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, check=True,
+                                capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_DIR,
+                               check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f'{commit}-dirty' if dirty else commit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--particles', type=int, default=20000)
+    parser.add_argument('--batches', type=int, default=5)
+    parser.add_argument('--threads', default=str(os.cpu_count() or 1),
+                        help='comma-separated thread counts, e.g. 1,2,4,8')
+    parser.add_argument('--ranks', default='', help='comma-separated MPI rank counts, e.g. 2,4 (default: none)')
+    parser.add_argument('--threads-per-rank', type=int, default=1)
+    parser.add_argument('--mpiexec', default='mpiexec')
+    parser.add_argument('--openmc', default='openmc', help='openmc executable')
+    parser.add_argument('--no-variants', action='store_true', help='only run the reference configuration')
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    parser.add_argument('--compare', help='earlier report to compare throughput with')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed relative throughput drop')
+    args = parser.parse_args()
+
+    import openmc
+
+    threads = [int(n) for n in args.threads.split(',') if n]
+    ranks = [int(n) for n in args.ranks.split(',') if n]
+    if ranks and shutil.which(args.mpiexec) is None:
+        parser.error(f'{args.mpiexec} not found')
+
+    cases = [('all', True, None, n) for n in threads]
+    cases += [('all', True, n, args.threads_per_rank) for n in ranks]
+    if not args.no_variants:
+        cases += [(tallies, True, None, max(threads)) for tallies in ('no_spectra', 'none', 'legacy')]
+        cases += [('all', False, None, max(threads))]
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, (tallies, photon_transport, n_ranks, n_threads) in enumerate(cases):
+            model = variant_model(tallies, photon_transport, args.particles, args.batches)
+            row = run_executable(model, os.path.join(tmp, f'case{i}'), n_threads, n_ranks, args.openmc, args.mpiexec)
+            row.update(tallies=tallies, photon_transport=photon_transport, ranks=n_ranks, threads=n_threads)
+            del row['statepoint']
+            rows.append(row)
+
+    print_table(rows, [*CASE_KEY, 'n_tallies', 'particles_per_second', 'initialization_time',
+                       'tally_reduction_time', 'peak_rss_mb', 'statepoint_bytes'])
+    report = {
+        'commit': git_commit(),
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'host': platform.node(),
+        'cpu_count': os.cpu_count(),
+        'python': sys.version.split()[0],
+        'openmc': openmc.__version__,
+        'particles': args.particles,
+        'batches': args.batches,
+        'cases': rows,
+    }
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=2)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        if (baseline['particles'], baseline['batches']) != (args.particles, args.batches):
+            print('warning: the baseline was run with a different particle budget')
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            sys.exit(f'{len(regressions)} case(s) slower than the baseline by more than {args.tolerance:.0%}')
+
+
+if __name__ == '__main__':
+    main()
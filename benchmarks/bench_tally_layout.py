@@ -0,0 +1,53 @@
+"""Compares the packed heating tally against the old one-tally-per-bin layout.
+
+Runs the model twice at a reduced particle budget, once with the packed
+heating tally and once with the 56 separate heating tallies, and reports
+particles/second and statepoint size for each.
+
+    python benchmarks/bench_tally_layout.py --particles 20000 --batches 5
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from _common import print_table, run_case
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--particles', type=int, default=20000)
+    parser.add_argument('--batches', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    import openmc
+    from openmc_model import build_model_parts, model_copy
+    from tally_builder import build_legacy_heating_tallies
+
+    parts = build_model_parts(particles=args.particles, batches=args.batches)
+    model = model_copy(particles=args.particles, batches=args.batches)
+
+    packed = list(model.tallies)
+    legacy = [tally for tally in packed if tally.name != parts.indices['heating'].name]
+    legacy += build_legacy_heating_tallies(parts.layer_cells)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = []
+        for layout, tallies in (('legacy', legacy), ('packed', packed)):
+            model.tallies = openmc.Tallies(tallies)
+            result = run_case(model, os.path.join(tmp, layout), threads=args.threads)
+            result['layout'] = layout
+            rows.append(result)
+
+    print_table(rows, ['layout', 'n_tallies', 'particles_per_second', 'statepoint_bytes'])
+    speedup = rows[1]['particles_per_second'] / rows[0]['particles_per_second']
+    print(f'packed/legacy throughput: {speedup:.3f}')
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(rows, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Declarative description of the layered toroidal blanket.
+
+A blanket is an ordered sequence of Layer(name, thickness, material), from
+the first wall outwards. Each layer becomes a ZTorus shell around the plasma
+chamber; `material` is the name of one of the model materials.
+"""
+import math
+from collections import namedtuple
+
+Layer = namedtuple('Layer', ['name', 'thickness', 'material'])
+
+# radial build of the reference design, thicknesses in cm
+DEFAULT_BLANKET = (
+    Layer('fw', 0.1, 'first_wall'),
+    Layer('str1', 1.0, 'structural_material'),
+    Layer('flibe1', 2.0, 'molten_salt'),
+    Layer('nm', 1.0, 'neutron_multiplier'),
+    Layer('str2', 3.0, 'structural_material'),
+    Layer('flibe2', 100.0, 'molten_salt'),
+    Layer('str3', 3.0, 'structural_material'),
+)
+
+
+def as_blanket(layers):
+    """Normalizes any sequence of (name, thickness, material) into a hashable blanket."""
+    blanket = tuple(Layer(str(name), float(thickness), str(material)) for name, thickness, material in layers)
+    names = [layer.name for layer in blanket]
+    if not blanket:
+        raise ValueError('a blanket needs at least one layer')
+    if len(set(names)) != len(names):
+        raise ValueError(f'layer names must be unique: {names}')
+    for layer in blanket:
+        if layer.thickness <= 0:
+            raise ValueError(f'layer {layer.name!r} has a non-positive thickness {layer.thickness}')
+    return blanket
+
+
+def layer_radii(layers, r_minor):
+    """Returns the inner minor radius of every layer plus the outer radius of the last one."""
+    radii = [r_minor]
+    for layer in layers:
+        radii.append(radii[-1] + layer.thickness)
+    return radii
+
+
+def radial_bins(layers, r_minor, bin_width):
+    """Splits every layer into equal bins of at most `bin_width` cm.
+
+    Returns the bin edges (minor radii, aligned with the layer boundaries)
+    and the name of the layer each bin belongs to.
+    """
+    edges = [r_minor]
+    bin_layers = []
+    for layer in layers:
+        n_bins = max(1, math.ceil(layer.thickness / bin_width - 1e-9))
+        start = edges[-1]
+        edges.extend(start + layer.thickness * (i + 1) / n_bins for i in range(n_bins))
+        bin_layers.extend([layer.name] * n_bins)
+    return edges, bin_layers
+
+
+def layer_volumes(layers, R_major, r_minor):
+    """Returns the volume (cm3) of every layer's torus shell, in layer order."""
+    radii = layer_radii(layers, r_minor)
+    return [2 * math.pi ** 2 * R_major * (outer ** 2 - inner ** 2) for inner, outer in zip(radii, radii[1:])]
+
+
+def build_geometry(layers, materials, chamber, R_major, r_minor):
+    """Builds the torus shells for `layers`.
+
+    `materials` maps material names to openmc.Material, `chamber` fills the
+    plasma chamber. Returns the geometry, the {layer name: cell} mapping in
+    radial order and the list of ZTorus surfaces (innermost first).
+    """
+    import openmc
+
+    radii = layer_radii(layers, r_minor)
+    surfaces = [openmc.ZTorus(x0=0.0, y0=0.0, z0=0.0, a=R_major, b=r, c=r) for r in radii]
+    surfaces[-1].boundary_type = 'vacuum'
+
+    inner_cell = openmc.Cell(1, name='inner', region=-surfaces[0], fill=chamber)
+    layer_cells = {}
+    for i, layer in enumerate(layers):
+        if layer.material not in materials:
+            raise KeyError(f'layer {layer.name!r} uses unknown material {layer.material!r}')
+        region = +surfaces[i] & -surfaces[i + 1]
+        layer_cells[layer.name] = openmc.Cell(i + 2, name=layer.name, region=region, fill=materials[layer.material])
+
+    universe = openmc.Universe(cells=[inner_cell, *layer_cells.values()])
+    geometry = openmc.Geometry()
+    geometry.root_universe = universe
+    return geometry, layer_cells, surfaces
@@ -0,0 +1,111 @@
+"""Stops transport once the reported quantities have converged.
+
+Each ConvergenceTarget gets a small dedicated tally. run_to_convergence()
+steps the run batch by batch through openmc.lib and, from `min_batches` on
+and every `interval` batches, stops as soon as the relative error of every
+target, summed over its bins, is below the threshold (or `max_batches` is
+reached), instead of always running the fixed batch count. It also writes a
+per-batch log of those relative errors and the elapsed time, which shows the
+cost/precision curve of the model.
+
+OpenMC tally triggers are not used: they apply to every filter and nuclide
+bin on its own, so a TBR target would wait for the Li7 bin of the thinnest
+breeding channel rather than for the reported TBR.
+
+    model, setup = convergence_model(DEFAULT_TARGETS, min_batches=10, max_batches=240)
+    statepoint = run_to_convergence(model, setup, 'converged_run')
+"""
+import csv
+import glob
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+import openmc
+from openmc.utility_funcs import change_directory
+
+from openmc_model import build_model_parts, model_copy
+from tally_builder import BREEDING_NUCLIDES
+
+# `score` of `particles` (None: all particles) in `layers`, of `nuclides` (None: the material
+# total); met when the relative error of its sum over all of them is below `threshold`
+ConvergenceTarget = namedtuple('ConvergenceTarget', ['name', 'layers', 'score', 'threshold', 'particles', 'nuclides'],
+                               defaults=[None, None])
+
+DEFAULT_TARGETS = (
+    # the reported TBR counts tritium from lithium only, not Be-9 (n,t) and the like
+    ConvergenceTarget('TBR', ('flibe1', 'flibe2'), '(n,Xt)', 0.01, nuclides=BREEDING_NUCLIDES),
+    ConvergenceTarget('fw heating', ('fw',), 'heating', 0.01),
+)
+
+# what run_to_convergence() needs besides the model: {target name: tally} and the stopping rule
+ConvergenceSetup = namedtuple('ConvergenceSetup', ['targets', 'tallies', 'min_batches', 'interval'])
+
+
+def convergence_model(targets=DEFAULT_TARGETS, min_batches=10, max_batches=240, interval=5, **params):
+    """Returns a copy of the model with a tally per target, and its ConvergenceSetup.
+
+    The copy runs at most `max_batches`; run_to_convergence() checks the
+    targets after `min_batches` and then every `interval` batches.
+    `params` are the build_model() parameters.
+    """
+    parts = build_model_parts(**params)
+    model = model_copy(**params)
+
+    target_tallies = {}
+    for target in targets:
+        tally = openmc.Tally(name=f'convergence {target.name}')
+        tally.filters = [openmc.CellFilter([parts.layer_cells[layer].id for layer in target.layers])]
+        if target.particles is not None:
+            tally.filters.append(openmc.ParticleFilter(list(target.particles)))
+        if target.nuclides is not None:
+            tally.nuclides = list(target.nuclides)
+        tally.scores = [target.score]
+        model.tallies.append(tally)
+        target_tallies[target.name] = tally
+
+    model.settings.batches = max_batches
+    return model, ConvergenceSetup(tuple(targets), target_tallies, min_batches, interval)
+
+
+def run_to_convergence(model, setup, directory, log='convergence.csv', threads=None):
+    """Runs a convergence_model() batch by batch until its targets are met; logs their relative errors.
+
+    The log (in `directory`) has one row per batch with the elapsed time and
+    the relative error of each target, summed over its bins. Returns the
+    path of the final statepoint.
+    """
+    import openmc.lib
+
+    os.makedirs(directory, exist_ok=True)
+    with change_directory(directory):
+        model.export_to_xml()
+        args = ['-s', str(threads)] if threads else None
+        with open(log, 'w', newline='') as fh, openmc.lib.run_in_memory(args=args, output=False):
+            writer = csv.writer(fh)
+            writer.writerow(['batch', 'elapsed', *(f'rel_err {target.name}' for target in setup.targets)])
+            openmc.lib.simulation_init()
+            start = time.perf_counter()
+            for _ in openmc.lib.iter_batches():
+                elapsed = time.perf_counter() - start
+                batch = openmc.lib.current_batch()
+                errors = [_rel_err(openmc.lib.tallies[setup.tallies[target.name].id]) for target in setup.targets]
+                writer.writerow([batch, elapsed, *errors])
+                fh.flush()
+                check = batch >= setup.min_batches and (batch - setup.min_batches) % setup.interval == 0
+                if check and all(error <= target.threshold for error, target in zip(errors, setup.targets)):
+                    # stopped before the last batch, which is the only one OpenMC writes by itself
+                    openmc.lib.statepoint_write()
+                    break
+            openmc.lib.simulation_finalize()
+        # the statepoint of the last batch run, whatever its zero-padding
+        return os.path.abspath(max(glob.glob('statepoint.*.h5'), key=os.path.getmtime))
+
+
+def _rel_err(tally):
+    # relative error of the target value: the sum of all bins, their variances added
+    total = tally.mean.sum()
+    if tally.num_realizations < 2 or total == 0:
+        return float('nan')
+    return float(np.sqrt(np.sum(tally.std_dev ** 2)) / abs(total))
@@ -0,0 +1,184 @@
+"""In-memory design iteration through openmc.lib.
+
+InMemoryDesign initializes OpenMC once (geometry, tallies and cross
+sections) and then changes material compositions and densities in memory
+between short runs, so every design variant only pays for transport. The
+optimizers below drive it: a bisection on the Li6 enrichment to hit a
+target TBR, and a small Gaussian-process loop for several variables.
+
+    with InMemoryDesign('iteration', batches=10, particles=50000) as design:
+        enrichment, history = bisect_enrichment(design, target_tbr=1.1)
+"""
+import contextlib
+import os
+
+import numpy as np
+
+from openmc_model import build_model_parts, model_copy
+
+
+class InMemoryDesign:
+    """A model loaded into openmc.lib whose materials can be changed between runs.
+
+    `params` are the build_model() parameters of the initial design;
+    `batches` and `particles` override its budget for the short runs.
+    """
+
+    def __init__(self, directory, batches=20, particles=None, threads=None, **params):
+        self.model = model_copy(**params)
+        self.model.settings.batches = batches
+        if particles is not None:
+            self.model.settings.particles = particles
+        self.indices = build_model_parts(**params).indices
+        self.directory = directory
+        self.threads = threads
+        self._stack = None
+
+    def __enter__(self):
+        import openmc.lib
+        from openmc.utility_funcs import change_directory
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._stack = contextlib.ExitStack()
+        self._stack.enter_context(change_directory(self.directory))
+        self.model.export_to_xml()
+        args = ['-s', str(self.threads)] if self.threads else None
+        self._stack.enter_context(openmc.lib.run_in_memory(args=args, output=False))
+        return self
+
+    def __exit__(self, *exc):
+        self._stack.close()
+        self._stack = None
+
+    def material(self, name):
+        """Returns the openmc.lib.Material of the model material called `name`."""
+        import openmc.lib
+
+        for material in self.model.materials:
+            if material.name == name:
+                return openmc.lib.materials[material.id]
+        raise KeyError(f'the model has no material {name!r}')
+
+    def set_li6_enrichment(self, enrichment, material='molten_salt'):
+        """Sets the Li6 atom fraction of the lithium, keeping the lithium atom density."""
+        lib_material = self.material(material)
+        nuclides = list(lib_material.nuclides)
+        densities = np.array(lib_material.densities)
+        li6, li7 = nuclides.index('Li6'), nuclides.index('Li7')
+        lithium = densities[li6] + densities[li7]
+        densities[li6] = lithium * enrichment
+        densities[li7] = lithium * (1 - enrichment)
+        lib_material.set_densities(nuclides, densities)
+
+    def set_density(self, material, density, units='g/cm3'):
+        """Scales the density of `material`, keeping its composition."""
+        self.material(material).set_density(density, units)
+
+    def run(self):
+        """Runs the current design and returns {tally name: (mean, std_dev)} on the named axes."""
+        import openmc.lib
+
+        openmc.lib.reset()
+        openmc.lib.run(output=False)
+        results = {}
+        for name, index in self.indices.items():
+            tally = openmc.lib.tallies[self._tally_ids[name]]
+            results[name] = (index.reshape(tally.mean), index.reshape(tally.std_dev))
+        return results
+
+    def tbr(self):
+        """Runs the current design and returns its TBR and standard deviation."""
+        mean, std_dev = self.run()['TBR']
+        return float(mean.sum()), float(np.sqrt(np.sum(std_dev ** 2)))
+
+    @property
+    def _tally_ids(self):
+        return {tally.name: tally.id for tally in self.model.tallies}
+
+
+def bisect_enrichment(design, target_tbr, low=0.075, high=0.99, tolerance=0.005, max_runs=20):
+    """Finds the Li6 enrichment giving `target_tbr` by bisection.
+
+    TBR is assumed to increase with enrichment between `low` and `high`.
+    Stops once the bracket is narrower than `tolerance` or the target lies
+    within one standard deviation. Returns the enrichment and the list of
+    (enrichment, tbr, std_dev) evaluated.
+    """
+    history = []
+
+    def evaluate(enrichment):
+        design.set_li6_enrichment(enrichment)
+        tbr, std_dev = design.tbr()
+        history.append((enrichment, tbr, std_dev))
+        return tbr, std_dev
+
+    tbr_low, _ = evaluate(low)
+    tbr_high, _ = evaluate(high)
+    if not tbr_low <= target_tbr <= tbr_high:
+        raise ValueError(f'target TBR {target_tbr} is outside [{tbr_low:.4f}, {tbr_high:.4f}] '
+                         f'reached between enrichments {low} and {high}')
+
+    while high - low > tolerance and len(history) < max_runs:
+        middle = (low + high) / 2
+        tbr, std_dev = evaluate(middle)
+        if abs(tbr - target_tbr) <= std_dev:
+            return middle, history
+        if tbr < target_tbr:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2, history
+
+
+def gaussian_process_minimize(objective, bounds, n_initial=4, n_iterations=10, length_scale=0.2, seed=1):
+    """Minimizes a noisy `objective` with a Gaussian process and expected improvement.
+
+    `objective(x)` takes a point (one value per entry of `bounds`, a list of
+    (low, high) pairs) and returns (value, std_dev); typically it sets the
+    design variables on an InMemoryDesign and runs it. The GP uses a squared
+    exponential kernel on the unit cube with the reported standard
+    deviations as observation noise. Returns the best point, its value and
+    the list of (x, value, std_dev) evaluated.
+    """
+    from scipy.stats import norm
+
+    rng = np.random.default_rng(seed)
+    bounds = np.asarray(bounds, dtype=float)
+    low, width = bounds[:, 0], bounds[:, 1] - bounds[:, 0]
+    history = []
+
+    def evaluate(unit_point):
+        x = low + unit_point * width
+        value, std_dev = objective(x)
+        history.append((x, value, std_dev))
+
+    for unit_point in rng.random((n_initial, len(bounds))):
+        evaluate(unit_point)
+
+    for _ in range(n_iterations):
+        points = np.array([(x - low) / width for x, _, _ in history])
+        values = np.array([value for _, value, _ in history])
+        noise = np.array([std_dev for _, _, std_dev in history]) ** 2
+        mean, scale = values.mean(), values.std() or 1.0
+
+        covariance = _squared_exponential(points, points, length_scale) + np.diag(noise / scale ** 2 + 1e-10)
+        factor = np.linalg.cholesky(covariance)
+        alpha = np.linalg.solve(factor.T, np.linalg.solve(factor, (values - mean) / scale))
+
+        candidates = rng.random((2048, len(bounds)))
+        cross = _squared_exponential(candidates, points, length_scale)
+        predicted = cross @ alpha
+        v = np.linalg.solve(factor, cross.T)
+        sigma = np.sqrt(np.clip(1.0 - np.sum(v ** 2, axis=0), 1e-12, None))
+        improvement = ((values.min() - mean) / scale) - predicted
+        z = improvement / sigma
+        expected_improvement = improvement * norm.cdf(z) + sigma * norm.pdf(z)
+        evaluate(candidates[np.argmax(expected_improvement)])
+
+    best = min(history, key=lambda entry: entry[1])
+    return best[0], best[1], history
+
+
+def _squared_exponential(a, b, length_scale):
+    distances = np.sum((a[:, None, :] - b[None, :, :]) ** 2, axis=-1)
+    return np.exp(-0.5 * distances / length_scale ** 2)
@@ -0,0 +1,145 @@
+"""Reduced nuclear-data library holding only what the model needs.
+
+The model uses a handful of nuclides at a single temperature (900 K), while
+a full ENDF/B-VIII.0 library carries every nuclide at every temperature.
+write_reduced_library() walks a built openmc.Model for the nuclides, photon
+elements and thermal scattering tables it needs, and copies only those
+files, keeping only the temperatures that match (or bracket) the model
+temperatures, next to a new cross_sections.xml. build_model() picks the
+library up automatically once it exists in REDUCED_LIBRARY_DIR.
+
+    python nuclear_data.py /path/to/endfb-viii.0-hdf5/cross_sections.xml
+"""
+import argparse
+import os
+import re
+
+REDUCED_LIBRARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nuclear_data')
+REDUCED_LIBRARY = os.path.join(REDUCED_LIBRARY_DIR, 'cross_sections.xml')
+
+# temperature-dependent groups are named after the temperature, e.g. '900K'
+_TEMPERATURE = re.compile(r'(\d+)K')
+
+
+def required_data(model):
+    """Returns the nuclides, photon elements, thermal tables and temperatures `model` needs."""
+    import openmc.data
+
+    nuclides, thermal, temperatures = set(), set(), set()
+    for material in model.materials:
+        nuclides.update(material.get_nuclides())
+        thermal.update(name for name, _ in material._sab)
+        if material.temperature is not None:
+            temperatures.add(float(material.temperature))
+        else:
+            temperatures.add(float(model.settings.temperature.get('default', 293.6)))
+
+    elements = set()
+    if model.settings.photon_transport:
+        for nuclide in nuclides:
+            elements.add(openmc.data.ATOMIC_SYMBOL[openmc.data.zam(nuclide)[0]])
+    return {'neutron': nuclides, 'photon': elements, 'thermal': thermal, 'temperatures': temperatures}
+
+
+def write_reduced_library(model, source, directory=REDUCED_LIBRARY_DIR):
+    """Writes the subset of the library `source` (a cross_sections.xml) needed by `model`.
+
+    Returns the path of the new cross_sections.xml. Neutron and thermal
+    files are trimmed to the temperatures selected by select_temperatures();
+    photon files have no temperature dependence and are copied as they are.
+    """
+    import openmc.data
+
+    required = required_data(model)
+    library = openmc.data.DataLibrary.from_xml(source)
+    reduced = openmc.data.DataLibrary()
+    os.makedirs(directory, exist_ok=True)
+
+    found = {kind: set() for kind in ('neutron', 'photon', 'thermal')}
+    for entry in library.libraries:
+        kind = entry['type']
+        if kind not in found:
+            continue
+        wanted = [name for name in entry['materials'] if name in required[kind]]
+        if not wanted:
+            continue
+        destination = os.path.join(directory, os.path.basename(entry['path']))
+        _copy_trimmed(entry['path'], destination, required['temperatures'] if kind != 'photon' else None)
+        reduced.register_file(destination)
+        found[kind].update(wanted)
+
+    missing = {kind: sorted(required[kind] - names) for kind, names in found.items() if required[kind] - names}
+    if missing:
+        raise ValueError(f'{source} lacks data required by the model: {missing}')
+
+    path = os.path.join(directory, 'cross_sections.xml')
+    reduced.export_to_xml(path)
+    return path
+
+
+def select_temperatures(available, temperatures):
+    """Returns the subset of `available` (in K) needed to evaluate the data at `temperatures`.
+
+    An exact match (within 1 K) is kept on its own, otherwise the two
+    bracketing temperatures are kept for interpolation, or the nearest one
+    when a temperature lies outside the tabulated range.
+    """
+    available = sorted(available)
+    selected = set()
+    for temperature in temperatures:
+        exact = [t for t in available if abs(t - temperature) <= 1.0]
+        if exact:
+            selected.add(exact[0])
+            continue
+        below = [t for t in available if t < temperature]
+        above = [t for t in available if t > temperature]
+        if below:
+            selected.add(below[-1])
+        if above:
+            selected.add(above[0])
+    return selected
+
+
+def _copy_trimmed(source, destination, temperatures):
+    import h5py
+
+    with h5py.File(source, 'r') as src, h5py.File(destination, 'w') as dst:
+        keep = None
+        if temperatures is not None:
+            available = set()
+            for group in src.values():
+                if 'kTs' in group:
+                    available.update(int(_TEMPERATURE.fullmatch(name).group(1)) for name in group['kTs'])
+            keep = {f'{t}K' for t in select_temperatures(available, temperatures)}
+        _copy_group(src, dst, keep)
+
+
+def _copy_group(src, dst, keep):
+    import h5py
+
+    for key, value in src.attrs.items():
+        dst.attrs[key] = value
+    for name, item in src.items():
+        if keep is not None and _TEMPERATURE.fullmatch(name) and name not in keep:
+            continue
+        if isinstance(item, h5py.Group):
+            _copy_group(item, dst.create_group(name), keep)
+        else:
+            src.copy(item, dst, name=name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write the reduced nuclear-data library of the model.')
+    parser.add_argument('source', help='cross_sections.xml of the full library')
+    parser.add_argument('--output', default=REDUCED_LIBRARY_DIR, help='directory of the reduced library')
+    args = parser.parse_args()
+
+    from openmc_model import build_model
+
+    # build against the full library, so the reduced one is not picked up while it is rewritten
+    path = write_reduced_library(build_model(cross_sections=args.source), args.source, args.output)
+    print(f'wrote {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,445 +1,291 @@
-import openmc
-import matplotlib.pyplot as plt
+"""OpenMC model of the layered FLiBe blanket.
+
+Importing this module builds nothing and writes nothing: call build_model()
+to get the openmc.Model, and export_model() (or run this file as a script)
+to write the XML inputs.
+"""
+import copy
+import functools
+import hashlib
+import json
 import math
+import os
+from collections import namedtuple
+
+from blanket import DEFAULT_BLANKET, as_blanket, build_geometry, layer_radii, radial_bins
+from nuclear_data import REDUCED_LIBRARY
 
 # cross_sections_path = r'/home/davide/openmc_models/CROSS_SECTIONS/endfb-viii.0-hdf5/cross_sections.xml'
 # openmc.config['cross_sections'] = cross_sections_path
 
-fw = openmc.Material(name='first_wall')  #first wall, TUNGSTEN
-fw.add_nuclide('W182', 26.5e-2)
-fw.add_nuclide('W180', 0.12e-2)
-fw.add_nuclide('W183', 14.31e-2)
-fw.add_nuclide('W184', 30.64e-2)
-fw.add_nuclide('W186', 28.43e-2)
-fw.set_density('g/cm3', 19.250)
-fw.temperature = 900.0  # temperature in Kelvin
-
-inconel = openmc.Material(name='structural_material')  #structural layers, INCONEL 18
-inconel.add_element('Al', 0.52e-2, 'wo')
-inconel.add_element('C', 0.021e-2, 'wo')
-inconel.add_element('Co', 0.11e-2, 'wo')
-inconel.add_element('Cr', 19.06e-2, 'wo')
-inconel.add_element('Cu', 0.02e-2, 'wo')
-inconel.add_element('Fe', 18.15e-2, 'wo')
-inconel.add_element('Mo', 3.04e-2, 'wo')
-inconel.add_element('Ti', 0.93e-2, 'wo')
-inconel.add_element('Nb', 5.08e-2, 'wo')
-inconel.add_element('Ni', 53.0e-2, 'wo')
-inconel.set_density('g/cm3', 8.19)
-inconel.temperature = 900.0
-
-flibe = openmc.Material(name='molten_salt')  #breeding blanket (Li-6 enrichment has been kept constant to 90 %), FLiBe
-flibe.add_element('F', 4.)
-flibe.add_element('Be', 1.)
-flibe.add_nuclide('Li6', 1.8)
-flibe.add_nuclide('Li7', 0.2)
-flibe.set_density('g/cm3', 1.94)
-flibe.temperature = 900.0
-
-nm = openmc.Material(name='neutron_multiplier')  #neutron multiplier, BERILLIUM
-nm.add_element('Be', 1.)
-nm.set_density('g/cm3', 1.848)
-nm.temperature = 900.0
-
-void = openmc.Material(name='chamber')  #hydrogen to simulate vacuum
-void.add_element('H', 1.0)
-void.set_density('g/cm3', 0.00000001)
-void.temperature = 900.0
-
-# Collect the materials together and export to XML
-vv_material = inconel
-materials = openmc.Materials([fw, vv_material, flibe, nm, void])
-materials.export_to_xml()
-
 FW_surface = 2458369.11 # cm2
 R_major = 330
 r_minor= FW_surface / (4 *  math.pi ** 2 * R_major)
 
-r_str1 = r_minor+0.1
-r_flibe1 = r_str1+1
-r_be = r_flibe1+2
-r_str2 = r_be+1
-r_flibe2 = r_str2+3
-r_str3 = r_flibe2+100
-r_outer = r_str3+3
-
-fw_inner = openmc.ZTorus(x0=0.0, y0=0.0, z0=0.0, a=R_major, b=r_minor, c=r_minor)
-str1_inner = openmc.ZTorus(x0=0.0, y0=0.0, z0=0.0, a=R_major, b=r_str1, c=r_str1)
-flibe1_inner = openmc.ZTorus(x0=0.0, y0=0.0, z0=0.0, a=R_major, b=r_flibe1, c=r_flibe1)
-be_inner = openmc.ZTorus(x0=0.0, y0=0.0, z0=0.0, a=R_major, b=r_be, c=r_be)
-str2_inner = openmc.ZTorus(x0=0.0, y0=0.0, z0=0.0, a=R_major, b=r_str2, c=r_str2)
-flibe2_iner = openmc.ZTorus(x0=0.0, y0=0.0, z0=0.0, a=R_major, b=r_flibe2, c=r_flibe2)
-str3_inner = openmc.ZTorus(x0=0.0, y0=0.0, z0=0.0, a=R_major, b=r_str3, c=r_str3)
-str3_outer = openmc.ZTorus(x0=0.0, y0=0.0, z0=0.0, a=R_major, b=r_outer, c=r_outer, boundary_type="vacuum")
-
-inner_region = -fw_inner
-fw_region = +fw_inner & -str1_inner
-str1_region = +str1_inner & -flibe1_inner
-flibe1_region = +flibe1_inner & -be_inner
-be_region = +be_inner & -str2_inner
-str2_region = +str2_inner & -flibe2_iner
-flibe2_region = +flibe2_iner & -str3_inner
-str3_region = +str3_inner & -str3_outer
-
-inner_cell = openmc.Cell(1, name='inner', region=inner_region, fill=void)
-firstwall_cell = openmc.Cell(2, region=fw_region, fill=fw)
-str1_cell = openmc.Cell(3, region=str1_region, fill=inconel)
-flibe1_cell = openmc.Cell(4, region=flibe1_region, fill=flibe)
-be_cell = openmc.Cell(5, region=be_region, fill=nm)
-str2_cell = openmc.Cell(6, region=str2_region, fill=inconel)
-flibe2_cell = openmc.Cell(7, region=flibe2_region, fill=flibe)
-str3_cell= openmc.Cell(8, region=str3_region, fill=inconel)
-
-universe = openmc.Universe(cells=[inner_cell, firstwall_cell, str1_cell, flibe1_cell, be_cell, str2_cell, flibe2_cell, str3_cell])
-
-geometry = openmc.Geometry()
-geometry.root_universe = universe
-geometry.export_to_xml()
-
-my_source = openmc.Source()
-radius = openmc.stats.Discrete([330], [1])
-z_values = openmc.stats.Discrete([0], [1])
-angle = openmc.stats.Uniform(a=0, b=math.radians(360))
-my_source.space = openmc.stats.CylindricalIndependent(r=radius, phi=angle, z=z_values, origin=(0.0, 0.0, 0.0))
-my_source.angle = openmc.stats.Isotropic()
-my_source.energy = openmc.stats.muir(e0=14080000.0, m_rat=5.0, kt=20000.0)
-
-settings = openmc.Settings()
-settings.batches = 240
-settings.particles = 4200000
-settings.inactive = 0
-settings.run_mode = 'fixed source'
-settings.source = my_source
-settings.photon_transport = True  # This line is required to switch on photons tracking
-settings.export_to_xml()
-
-# adds a tally to record neutron spectra on STR1
-energy_bins = openmc.mgxs.GROUP_STRUCTURES['VITAMIN-J-175']
-energy_filter = openmc.EnergyFilter(energy_bins)
-
-fw_filter = openmc.CellFilter(firstwall_cell)
-str1_filter = openmc.CellFilter(str1_cell)
-flibe1_filter = openmc.CellFilter(flibe1_cell)
-nm_filter = openmc.CellFilter(be_cell)
-str2_filter = openmc.CellFilter(str2_cell)
-flibe2_filter = openmc.CellFilter(flibe2_cell)
-str3_filter = openmc.CellFilter(str3_cell)
-
-neutron_particle_filter = openmc.ParticleFilter(['neutron'])
-photon_particle_filter = openmc.ParticleFilter(['photon'])
-electron_particle_filter = openmc.ParticleFilter(['electron'])
-positron_particle_filter = openmc.ParticleFilter(['positron'])
-
-# makes a tally to distinguish tritium production from Li6 and Li7
-tbr_tally_channel = openmc.Tally(name='TBR channel')
-tbr_tally_channel.filters = [flibe1_filter]
-tbr_tally_channel.scores = ['(n,Xt)']
-tbr_tally_channel.nuclides = [openmc.Nuclide('Li6'), openmc.Nuclide('Li7')]
-
-tbr_tally_tank = openmc.Tally(name='TBR tank')
-tbr_tally_tank.filters = [flibe2_filter]
-tbr_tally_tank.scores = ['(n,Xt)']
-tbr_tally_tank.nuclides = [openmc.Nuclide('Li6'), openmc.Nuclide('Li7')]
-
-# makes a tally for neutron flux on FW
-cell_spectra_tally1 = openmc.Tally(name='cell_flux_tally_fw')
-cell_spectra_tally1.scores = ['flux']
-cell_spectra_tally1.filters = [fw_filter, neutron_particle_filter, electron_particle_filter, positron_particle_filter, photon_particle_filter]
-
-# makes a tally for neutron flux on STR1 (the unit of measurement will then be changed)
-cell_spectra_tally2 = openmc.Tally(name='cell_flux_tally_str1')
-cell_spectra_tally2.scores = ['flux']
-cell_spectra_tally2.filters = [str1_filter, neutron_particle_filter]
-
-# Heating FW
-heating_n_fw_tally = openmc.Tally(name="heating fw n")
-heating_n_fw_tally.scores = ["heating"]
-heating_n_fw_tally.filters = [fw_filter, neutron_particle_filter]
-
-heating_n_fw_tally1 = openmc.Tally(name="heating fw electron")
-heating_n_fw_tally1.scores = ["heating"]
-heating_n_fw_tally1.filters = [fw_filter, electron_particle_filter]
-
-heating_n_fw_tally2 = openmc.Tally(name="heating fw photon")
-heating_n_fw_tally2.scores = ["heating"]
-heating_n_fw_tally2.filters = [fw_filter, photon_particle_filter]
-
-heating_n_fw_tally3 = openmc.Tally(name="heating fw positron")
-heating_n_fw_tally3.scores = ["heating"]
-heating_n_fw_tally3.filters = [fw_filter, positron_particle_filter]
-
-heating_p_fw_tally = openmc.Tally(name="heating fw tot n")
-heating_p_fw_tally.scores = ["heating-local"]
-heating_p_fw_tally.filters = [fw_filter, neutron_particle_filter]
-
-heating_p_fw_tally1 = openmc.Tally(name="heating fw tot electron")
-heating_p_fw_tally1.scores = ["heating-local"]
-heating_p_fw_tally1.filters = [fw_filter, electron_particle_filter]
-
-heating_p_fw_tally2 = openmc.Tally(name="heating fw tot photon")
-heating_p_fw_tally2.scores = ["heating-local"]
-heating_p_fw_tally2.filters = [fw_filter, photon_particle_filter]
-
-heating_p_fw_tally3 = openmc.Tally(name="heating fw tot positron")
-heating_p_fw_tally3.scores = ["heating-local"]
-heating_p_fw_tally3.filters = [fw_filter, positron_particle_filter]
-
-# Heating STR1
-heating_n_str1_tally = openmc.Tally(name="heating str1 n")
-heating_n_str1_tally.scores = ["heating"]
-heating_n_str1_tally.filters = [str1_filter, neutron_particle_filter]
-
-heating_n_str1_tally1 = openmc.Tally(name="heating str1 electron")
-heating_n_str1_tally1.scores = ["heating"]
-heating_n_str1_tally1.filters = [str1_filter, electron_particle_filter]
-
-heating_n_str1_tally2 = openmc.Tally(name="heating str1 photon")
-heating_n_str1_tally2.scores = ["heating"]
-heating_n_str1_tally2.filters = [str1_filter, photon_particle_filter]
-
-heating_n_str1_tally3 = openmc.Tally(name="heating str1 positron")
-heating_n_str1_tally3.scores = ["heating"]
-heating_n_str1_tally3.filters = [str1_filter, positron_particle_filter]
-
-heating_p_str1_tally = openmc.Tally(name="heating str1 tot n")
-heating_p_str1_tally.scores = ["heating-local"]
-heating_p_str1_tally.filters = [str1_filter, neutron_particle_filter]
-
-heating_p_str1_tally1 = openmc.Tally(name="heating str1 tot electron")
-heating_p_str1_tally1.scores = ["heating-local"]
-heating_p_str1_tally1.filters = [str1_filter, electron_particle_filter]
-
-heating_p_str1_tally2 = openmc.Tally(name="heating str1 tot photon")
-heating_p_str1_tally2.scores = ["heating-local"]
-heating_p_str1_tally2.filters = [str1_filter, photon_particle_filter]
-
-heating_p_str1_tally3 = openmc.Tally(name="heating str1 tot positron")
-heating_p_str1_tally3.scores = ["heating-local"]
-heating_p_str1_tally3.filters = [str1_filter, positron_particle_filter]
-
-# Heating FLiBe1
-heating_n_flibe1_tally = openmc.Tally(name="heating flibe1 n")
-heating_n_flibe1_tally.scores = ["heating"]
-heating_n_flibe1_tally.filters = [flibe1_filter, neutron_particle_filter]
-
-heating_n_flibe1_tally1 = openmc.Tally(name="heating flibe1 electron")
-heating_n_flibe1_tally1.scores = ["heating"]
-heating_n_flibe1_tally1.filters = [flibe1_filter, electron_particle_filter]
-
-heating_n_flibe1_tally2 = openmc.Tally(name="heating flibe1 photon")
-heating_n_flibe1_tally2.scores = ["heating"]
-heating_n_flibe1_tally2.filters = [flibe1_filter, photon_particle_filter]
-
-heating_n_flibe1_tally3 = openmc.Tally(name="heating flibe1 positron")
-heating_n_flibe1_tally3.scores = ["heating"]
-heating_n_flibe1_tally3.filters = [flibe1_filter, positron_particle_filter]
-
-heating_p_flibe1_tally = openmc.Tally(name="heating flibe1 tot n")
-heating_p_flibe1_tally.scores = ["heating-local"]
-heating_p_flibe1_tally.filters = [flibe1_filter, neutron_particle_filter]
-
-heating_p_flibe1_tally1 = openmc.Tally(name="heating flibe1 tot electron")
-heating_p_flibe1_tally1.scores = ["heating-local"]
-heating_p_flibe1_tally1.filters = [flibe1_filter, electron_particle_filter]
-
-heating_p_flibe1_tally2 = openmc.Tally(name="heating flibe1 tot photon")
-heating_p_flibe1_tally2.scores = ["heating-local"]
-heating_p_flibe1_tally2.filters = [flibe1_filter, photon_particle_filter]
-
-heating_p_flibe1_tally3 = openmc.Tally(name="heating flibe1 tot positron")
-heating_p_flibe1_tally3.scores = ["heating-local"]
-heating_p_flibe1_tally3.filters = [flibe1_filter, positron_particle_filter]
-
-# Heating Neutron Multiplier
-heating_n_nm_tally = openmc.Tally(name="heating nm n")
-heating_n_nm_tally.scores = ["heating"]
-heating_n_nm_tally.filters = [nm_filter, neutron_particle_filter]
-
-heating_n_nm_tally1 = openmc.Tally(name="heating nm electron")
-heating_n_nm_tally1.scores = ["heating"]
-heating_n_nm_tally1.filters = [nm_filter, electron_particle_filter]
-
-heating_n_nm_tally2 = openmc.Tally(name="heating nm photon")
-heating_n_nm_tally2.scores = ["heating"]
-heating_n_nm_tally2.filters = [nm_filter, photon_particle_filter]
-
-heating_n_nm_tally3 = openmc.Tally(name="heating nm positron")
-heating_n_nm_tally3.scores = ["heating"]
-heating_n_nm_tally3.filters = [nm_filter, positron_particle_filter]
-
-heating_p_nm_tally = openmc.Tally(name="heating nm tot n")
-heating_p_nm_tally.scores = ["heating-local"]
-heating_p_nm_tally.filters = [nm_filter, neutron_particle_filter]
-
-heating_p_nm_tally1 = openmc.Tally(name="heating nm tot electron")
-heating_p_nm_tally1.scores = ["heating-local"]
-heating_p_nm_tally1.filters = [nm_filter, electron_particle_filter]
-
-heating_p_nm_tally2 = openmc.Tally(name="heating nm tot photon")
-heating_p_nm_tally2.scores = ["heating-local"]
-heating_p_nm_tally2.filters = [nm_filter, photon_particle_filter]
-
-heating_p_nm_tally3 = openmc.Tally(name="heating nm tot positron")
-heating_p_nm_tally3.scores = ["heating-local"]
-heating_p_nm_tally3.filters = [nm_filter, positron_particle_filter]
-
-# Heating STR2
-heating_n_str2_tally = openmc.Tally(name="heating str2 n")
-heating_n_str2_tally.scores = ["heating"]
-heating_n_str2_tally.filters = [str2_filter, neutron_particle_filter]
-
-heating_n_str2_tally1 = openmc.Tally(name="heating str2 electron")
-heating_n_str2_tally1.scores = ["heating"]
-heating_n_str2_tally1.filters = [str2_filter, electron_particle_filter]
-
-heating_n_str2_tally2 = openmc.Tally(name="heating str2 photon")
-heating_n_str2_tally2.scores = ["heating"]
-heating_n_str2_tally2.filters = [str2_filter, photon_particle_filter]
-
-heating_n_str2_tally3 = openmc.Tally(name="heating str2 positron")
-heating_n_str2_tally3.scores = ["heating"]
-heating_n_str2_tally3.filters = [str2_filter, positron_particle_filter]
-
-heating_p_str2_tally = openmc.Tally(name="heating str2 tot n")
-heating_p_str2_tally.scores = ["heating-local"]
-heating_p_str2_tally.filters = [str2_filter, neutron_particle_filter]
-
-heating_p_str2_tally1 = openmc.Tally(name="heating str2 tot electron")
-heating_p_str2_tally1.scores = ["heating-local"]
-heating_p_str2_tally1.filters = [str2_filter, electron_particle_filter]
-
-heating_p_str2_tally2 = openmc.Tally(name="heating str2 tot photon")
-heating_p_str2_tally2.scores = ["heating-local"]
-heating_p_str2_tally2.filters = [str2_filter, photon_particle_filter]
-
-heating_p_str2_tally3 = openmc.Tally(name="heating str2 tot positron")
-heating_p_str2_tally3.scores = ["heating-local"]
-heating_p_str2_tally3.filters = [str2_filter, positron_particle_filter]
-
-# Heating FLiBe2
-heating_n_flibe2_tally = openmc.Tally(name="heating flibe2 n")
-heating_n_flibe2_tally.scores = ["heating"]
-heating_n_flibe2_tally.filters = [flibe2_filter, neutron_particle_filter]
-
-heating_n_flibe2_tally1 = openmc.Tally(name="heating flibe2 electron")
-heating_n_flibe2_tally1.scores = ["heating"]
-heating_n_flibe2_tally1.filters = [flibe2_filter, electron_particle_filter]
-
-heating_n_flibe2_tally2 = openmc.Tally(name="heating flibe2 photon")
-heating_n_flibe2_tally2.scores = ["heating"]
-heating_n_flibe2_tally2.filters = [flibe2_filter, photon_particle_filter]
-
-heating_n_flibe2_tally3 = openmc.Tally(name="heating flibe2 positron")
-heating_n_flibe2_tally3.scores = ["heating"]
-heating_n_flibe2_tally3.filters = [flibe2_filter, positron_particle_filter]
-
-heating_p_flibe2_tally = openmc.Tally(name="heating flibe2 tot n")
-heating_p_flibe2_tally.scores = ["heating-local"]
-heating_p_flibe2_tally.filters = [flibe2_filter, neutron_particle_filter]
-
-heating_p_flibe2_tally1 = openmc.Tally(name="heating flibe2 tot electron")
-heating_p_flibe2_tally1.scores = ["heating-local"]
-heating_p_flibe2_tally1.filters = [flibe2_filter, electron_particle_filter]
-
-heating_p_flibe2_tally2 = openmc.Tally(name="heating flibe2 tot photon")
-heating_p_flibe2_tally2.scores = ["heating-local"]
-heating_p_flibe2_tally2.filters = [flibe2_filter, photon_particle_filter]
-
-heating_p_flibe2_tally3 = openmc.Tally(name="heating flibe2 tot positron")
-heating_p_flibe2_tally3.scores = ["heating-local"]
-heating_p_flibe2_tally3.filters = [flibe2_filter, positron_particle_filter]
-
-# Heating STR3
-heating_n_str3_tally = openmc.Tally(name="heating str3 n")
-heating_n_str3_tally.scores = ["heating"]
-heating_n_str3_tally.filters = [str3_filter, neutron_particle_filter]
-
-heating_n_str3_tally1 = openmc.Tally(name="heating str3 electron")
-heating_n_str3_tally1.scores = ["heating"]
-heating_n_str3_tally1.filters = [str3_filter, electron_particle_filter]
-
-heating_n_str3_tally2 = openmc.Tally(name="heating str3 photon")
-heating_n_str3_tally2.scores = ["heating"]
-heating_n_str3_tally2.filters = [str3_filter, photon_particle_filter]
-
-heating_n_str3_tally3 = openmc.Tally(name="heating str3 positron")
-heating_n_str3_tally3.scores = ["heating"]
-heating_n_str3_tally3.filters = [str3_filter, positron_particle_filter]
-
-heating_p_str3_tally = openmc.Tally(name="heating str3 tot n")
-heating_p_str3_tally.scores = ["heating-local"]
-heating_p_str3_tally.filters = [str3_filter, neutron_particle_filter]
-
-heating_p_str3_tally1 = openmc.Tally(name="heating str3 tot electron")
-heating_p_str3_tally1.scores = ["heating-local"]
-heating_p_str3_tally1.filters = [str3_filter, electron_particle_filter]
-
-heating_p_str3_tally2 = openmc.Tally(name="heating str3 tot photon")
-heating_p_str3_tally2.scores = ["heating-local"]
-heating_p_str3_tally2.filters = [str3_filter, photon_particle_filter]
-
-heating_p_str3_tally3 = openmc.Tally(name="heating str3 tot positron")
-heating_p_str3_tally3.scores = ["heating-local"]
-heating_p_str3_tally3.filters = [str3_filter, positron_particle_filter]
-
-# NEUTRON SPECTRA
-# FW
-neutronspectra_fw_cell_tally = openmc.Tally(name='neutron_spectra_fw')
-neutronspectra_fw_cell_tally.filters = [fw_filter, neutron_particle_filter, energy_filter]
-neutronspectra_fw_cell_tally.scores = ['flux']
-
-# STR1
-neutronspectra_str1_cell_tally = openmc.Tally(name='neutron_spectra_str1')
-neutronspectra_str1_cell_tally.filters = [str1_filter, neutron_particle_filter, energy_filter]
-neutronspectra_str1_cell_tally.scores = ['flux']
-
-# FLiBe1
-neutronspectra_flibe1_cell_tally = openmc.Tally(name='neutron_spectra_flibe1')
-neutronspectra_flibe1_cell_tally.filters = [flibe1_filter, neutron_particle_filter, energy_filter]
-neutronspectra_flibe1_cell_tally.scores = ['flux']
-
-# NM
-neutronspectra_nm_cell_tally = openmc.Tally(name='neutron_spectra_nm')
-neutronspectra_nm_cell_tally.filters = [nm_filter, neutron_particle_filter, energy_filter]
-neutronspectra_nm_cell_tally.scores = ['flux']
-
-# STR2
-neutronspectra_str2_cell_tally = openmc.Tally(name='neutron_spectra_str2')
-neutronspectra_str2_cell_tally.filters = [str2_filter, neutron_particle_filter, energy_filter]
-neutronspectra_str2_cell_tally.scores = ['flux']
-
-# FLiBe2
-neutronspectra_flibe2_cell_tally = openmc.Tally(name='neutron_spectra_flibe2')
-neutronspectra_flibe2_cell_tally.filters = [flibe2_filter, neutron_particle_filter, energy_filter]
-neutronspectra_flibe2_cell_tally.scores = ['flux']
-
-# STR3
-neutronspectra_str3_cell_tally = openmc.Tally(name='neutron_spectra_str3')
-neutronspectra_str3_cell_tally.filters = [str3_filter, neutron_particle_filter, energy_filter]
-neutronspectra_str3_cell_tally.scores = ['flux']
-
-# groups the tallies
-tallies = openmc.Tallies([tbr_tally_channel, tbr_tally_tank, cell_spectra_tally1, cell_spectra_tally2,
-                          heating_n_fw_tally, heating_n_fw_tally1, heating_n_fw_tally2, heating_n_fw_tally3,
-                          heating_p_fw_tally, heating_p_fw_tally1, heating_p_fw_tally2, heating_p_fw_tally3,
-                          heating_n_str1_tally, heating_n_str1_tally1, heating_n_str1_tally2, heating_n_str1_tally3,
-                          heating_p_str1_tally, heating_p_str1_tally1, heating_p_str1_tally2, heating_p_str1_tally3,
-                          heating_n_flibe1_tally, heating_n_flibe1_tally1, heating_n_flibe1_tally2, heating_n_flibe1_tally3,
-                          heating_p_flibe1_tally, heating_p_flibe1_tally1, heating_p_flibe1_tally2, heating_p_flibe1_tally3,
-                          heating_n_nm_tally, heating_n_nm_tally1, heating_n_nm_tally2, heating_n_nm_tally3,
-                          heating_p_nm_tally, heating_p_nm_tally1, heating_p_nm_tally2, heating_p_nm_tally3,
-                          heating_n_str2_tally, heating_n_str2_tally1, heating_n_str2_tally2, heating_n_str2_tally3,
-                          heating_p_str2_tally, heating_p_str2_tally1, heating_p_str2_tally2, heating_p_str2_tally3,
-                          heating_n_flibe2_tally, heating_n_flibe2_tally1, heating_n_flibe2_tally2, heating_n_flibe2_tally3,
-                          heating_p_flibe2_tally, heating_p_flibe2_tally1, heating_p_flibe2_tally2, heating_p_flibe2_tally3,
-                          heating_n_str3_tally, heating_n_str3_tally1, heating_n_str3_tally2, heating_n_str3_tally3,
-                          heating_p_str3_tally, heating_p_str3_tally1, heating_p_str3_tally2, heating_p_str3_tally3,
-                          neutronspectra_fw_cell_tally, neutronspectra_str1_cell_tally, neutronspectra_flibe1_cell_tally,
-                          neutronspectra_nm_cell_tally, neutronspectra_str2_cell_tally, neutronspectra_flibe2_cell_tally,
-                          neutronspectra_str3_cell_tally])
-tallies.export_to_xml()
-
-# builds the openmc model
-my_model = openmc.Model(
-    materials=materials, geometry=geometry, settings=settings, tallies=tallies
-)
\ No newline at end of file
+# energy released per D-T fusion reaction, one neutron each
+DT_FUSION_ENERGY = 17.58e6 * 1.602176634e-19  # J
+
+# parameters accepted by build_model() and their defaults
+DEFAULT_PARAMS = {
+    'batches': 240,
+    'particles': 4200000,
+    'photon_transport': True,
+    'li6_enrichment': 0.9,  # atom fraction of Li6 in the FLiBe lithium
+    'flibe_density': 1.94,  # g/cm3
+    'be_density': 1.848,  # g/cm3
+    'cross_sections': None,  # path to a cross_sections.xml, otherwise the reduced library or the OpenMC default
+    'blanket': DEFAULT_BLANKET,  # radial build, see blanket.py
+    'radial_profile': None,  # bin width (cm) of the (R, Z) profile mesh replacing the per-layer heating and flux
+    'source_file': None,  # OpenMC source file replacing the ring source, e.g. from plasma_source.py
+}
+
+# modules whose code defines the model content: materials, geometry, source and tallies
+MODEL_SOURCES = ('openmc_model.py', 'blanket.py', 'tally_builder.py')
+
+# the built model together with the handles needed to address its results
+ModelParts = namedtuple('ModelParts', ['model', 'layer_cells', 'surfaces', 'indices'])
+
+
+def build_model(**params):
+    """Returns the openmc.Model for the given parameters (see DEFAULT_PARAMS).
+
+    Construction is memoized: repeated calls with the same parameters return
+    the same object, so callers that need to modify it should use
+    model_copy(). No files are written.
+    """
+    return build_model_parts(**params).model
+
+
+def model_copy(**params):
+    """Returns a deep copy of build_model(**params) that can be modified freely."""
+    return copy.deepcopy(build_model_parts(**params).model)
+
+
+def build_model_parts(**params):
+    """Same as build_model() but also returns the layer cells, surfaces and tally indices."""
+    return _build_model_parts(tuple(sorted(_merge_params(params).items())))
+
+
+def spec_hash(**params):
+    """Returns a short hash identifying the model built from `params`."""
+    merged = _merge_params(params)
+    text = json.dumps(merged, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def model_hash(**params):
+    """Returns a short hash of the model content built from `params`.
+
+    Unlike spec_hash(), it also covers the code of MODEL_SOURCES and the
+    cross sections the model resolves to, so it changes when the model
+    definition itself is edited between two runs with the same parameters.
+    """
+    key = hashlib.sha256(spec_hash(**params).encode())
+    for name in MODEL_SOURCES:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), name), 'rb') as fh:
+            key.update(fh.read())
+    key.update(str(build_model(**params).materials.cross_sections).encode())
+    return key.hexdigest()[:16]
+
+
+def _merge_params(params):
+    unknown = set(params) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise TypeError(f'unknown model parameters: {sorted(unknown)}')
+    merged = {**DEFAULT_PARAMS, **params}
+    merged['blanket'] = as_blanket(merged['blanket'])
+    return merged
+
+
+def profile_grid(**params):
+    """Returns the R and Z edges (cm) of the radial profile mesh.
+
+    The mesh covers the whole poloidal section of the blanket with square
+    bins of at most the radial_profile width.
+    """
+    merged = _merge_params(params)
+    if merged['radial_profile'] is None:
+        raise ValueError('the model has no radial profile, set radial_profile to a bin width')
+    outer = layer_radii(merged['blanket'], r_minor)[-1]
+    n_bins = math.ceil(2 * outer / merged['radial_profile'] - 1e-9)
+    r_edges = [R_major - outer + 2 * outer * i / n_bins for i in range(n_bins + 1)]
+    z_edges = [-outer + 2 * outer * i / n_bins for i in range(n_bins + 1)]
+    return r_edges, z_edges
+
+
+def profile_bins(**params):
+    """Returns the minor radius (cm) and the layer name of every radial profile bin.
+
+    Both are (z, r) arrays laid out like the 'radial_profile' tally index and
+    taken at the bin centres, so a bin across a layer boundary belongs to the
+    layer of its centre. The layer is 'inner' in the plasma chamber and ''
+    outside the blanket.
+    """
+    import numpy as np
+
+    merged = _merge_params(params)
+    r_edges, z_edges = (np.asarray(edges) for edges in profile_grid(**params))
+    r_centers = (r_edges[1:] + r_edges[:-1]) / 2
+    z_centers = (z_edges[1:] + z_edges[:-1]) / 2
+    minor_radii = np.hypot(r_centers[None, :] - R_major, z_centers[:, None])
+    names = np.array(['inner', *(layer.name for layer in merged['blanket']), ''], dtype=object)
+    layers = names[np.searchsorted(layer_radii(merged['blanket'], r_minor), minor_radii, side='right')]
+    return minor_radii, layers
+
+
+def profile_volumes(**params):
+    """Returns the (z, r) array of radial profile bin volumes (cm3), to turn the tallies into densities."""
+    import numpy as np
+
+    r_edges, z_edges = (np.asarray(edges) for edges in profile_grid(**params))
+    return np.diff(z_edges)[:, None] * (math.pi * np.diff(r_edges ** 2))[None, :]
+
+
+def collapse_profile(values, **params):
+    """Sums (z, r, ...) radial profile values into minor-radius bins.
+
+    The bins are those of blanket.radial_bins(): every layer split into
+    equal bins of at most the radial_profile width. A mesh bin goes to the
+    bin of its centre, so collapse profile_volumes() the same way to get
+    densities. Returns the bin edges, the layer of every bin and the summed
+    values; bins thinner than the mesh spacing may receive no mesh bin.
+    """
+    import numpy as np
+
+    merged = _merge_params(params)
+    edges, bin_layers = radial_bins(merged['blanket'], r_minor, merged['radial_profile'])
+    minor_radii, _ = profile_bins(**params)
+    values = np.asarray(values)
+    which = np.searchsorted(edges, minor_radii, side='right') - 1
+    inside = (which >= 0) & (which < len(edges) - 1)
+    collapsed = np.zeros((len(edges) - 1, *values.shape[2:]), dtype=values.dtype)
+    np.add.at(collapsed, which[inside], values[inside])
+    return edges, bin_layers, collapsed
+
+
+def neutron_source_rate(fusion_power):
+    """Returns the D-T neutron source rate (n/s) for a fusion power in W."""
+    return fusion_power / DT_FUSION_ENERGY
+
+
+def export_model(directory='.', **params):
+    """Builds the model and writes its XML inputs to `directory`."""
+    model = build_model(**params)
+    model.export_to_xml(directory)
+    return model
+
+
+@functools.lru_cache(maxsize=None)
+def _build_model_parts(items):
+    import openmc
+    from tally_builder import build_blanket_tallies, build_radial_profile_tallies
+
+    params = dict(items)
+
+    fw = openmc.Material(name='first_wall')  #first wall, TUNGSTEN
+    fw.add_nuclide('W182', 26.5e-2)
+    fw.add_nuclide('W180', 0.12e-2)
+    fw.add_nuclide('W183', 14.31e-2)
+    fw.add_nuclide('W184', 30.64e-2)
+    fw.add_nuclide('W186', 28.43e-2)
+    fw.set_density('g/cm3', 19.250)
+    fw.temperature = 900.0  # temperature in Kelvin
+
+    inconel = openmc.Material(name='structural_material')  #structural layers, INCONEL 18
+    inconel.add_element('Al', 0.52e-2, 'wo')
+    inconel.add_element('C', 0.021e-2, 'wo')
+    inconel.add_element('Co', 0.11e-2, 'wo')
+    inconel.add_element('Cr', 19.06e-2, 'wo')
+    inconel.add_element('Cu', 0.02e-2, 'wo')
+    inconel.add_element('Fe', 18.15e-2, 'wo')
+    inconel.add_element('Mo', 3.04e-2, 'wo')
+    inconel.add_element('Ti', 0.93e-2, 'wo')
+    inconel.add_element('Nb', 5.08e-2, 'wo')
+    inconel.add_element('Ni', 53.0e-2, 'wo')
+    inconel.set_density('g/cm3', 8.19)
+    inconel.temperature = 900.0
+
+    flibe = openmc.Material(name='molten_salt')  #breeding blanket (Li-6 enrichment defaults to 90 %), FLiBe
+    flibe.add_element('F', 4.)
+    flibe.add_element('Be', 1.)
+    flibe.add_nuclide('Li6', 2 * params['li6_enrichment'])
+    flibe.add_nuclide('Li7', 2 * (1 - params['li6_enrichment']))
+    flibe.set_density('g/cm3', params['flibe_density'])
+    flibe.temperature = 900.0
+
+    nm = openmc.Material(name='neutron_multiplier')  #neutron multiplier, BERILLIUM
+    nm.add_element('Be', 1.)
+    nm.set_density('g/cm3', params['be_density'])
+    nm.temperature = 900.0
+
+    void = openmc.Material(name='chamber')  #hydrogen to simulate vacuum
+    void.add_element('H', 1.0)
+    void.set_density('g/cm3', 0.00000001)
+    void.temperature = 900.0
+
+    # Collect the materials together
+    vv_material = inconel
+    materials = openmc.Materials([fw, vv_material, flibe, nm, void])
+    if params['cross_sections'] is not None:
+        materials.cross_sections = params['cross_sections']
+    elif os.path.exists(REDUCED_LIBRARY):
+        # trimmed to this model's nuclides and temperature, see nuclear_data.py
+        materials.cross_sections = REDUCED_LIBRARY
+
+    # builds the torus shells of the radial build, from the first wall outwards
+    materials_by_name = {material.name: material for material in materials}
+    geometry, layer_cells, surfaces = build_geometry(params['blanket'], materials_by_name, void, R_major, r_minor)
+
+    my_source = openmc.Source()
+    radius = openmc.stats.Discrete([330], [1])
+    z_values = openmc.stats.Discrete([0], [1])
+    angle = openmc.stats.Uniform(a=0, b=math.radians(360))
+    my_source.space = openmc.stats.CylindricalIndependent(r=radius, phi=angle, z=z_values, origin=(0.0, 0.0, 0.0))
+    my_source.angle = openmc.stats.Isotropic()
+    my_source.energy = openmc.stats.muir(e0=14080000.0, m_rat=5.0, kt=20000.0)
+
+    settings = openmc.Settings()
+    settings.batches = params['batches']
+    settings.particles = params['particles']
+    settings.inactive = 0
+    settings.run_mode = 'fixed source'
+    if params['source_file'] is not None:
+        # tabulated plasma source, see plasma_source.py
+        settings.source = openmc.FileSource(params['source_file'])
+    else:
+        settings.source = my_source
+    settings.photon_transport = params['photon_transport']  # This line is required to switch on photons tracking
+
+    # TBR, flux, heating and neutron spectra of every layer, one packed tally each;
+    # the indices address the results by layer, particle, score, ...
+    breeding_layers = [name for name, cell in layer_cells.items() if 'Li6' in cell.fill.get_nuclides()]
+    blanket_tallies, indices = build_blanket_tallies(layer_cells, breeding_layers,
+                                                     layer_heating=params['radial_profile'] is None)
+    if params['radial_profile'] is not None:
+        # heating and flux of all particles on one (R, Z) mesh over the whole poloidal section,
+        # replacing the per-layer tallies; profile_bins() maps every bin to a minor radius and layer
+        r_edges, z_edges = profile_grid(**params)
+        mesh = openmc.CylindricalMesh(r_grid=r_edges, phi_grid=[0.0, 2 * math.pi], z_grid=z_edges)
+        mesh.name = 'radial_profile'
+        r_centers = [(inner + outer) / 2 for inner, outer in zip(r_edges, r_edges[1:])]
+        z_centers = [(lower + upper) / 2 for lower, upper in zip(z_edges, z_edges[1:])]
+        profile_tallies, indices['radial_profile'] = build_radial_profile_tallies(mesh, r_centers, z_centers)
+        blanket_tallies += profile_tallies
+    tallies = openmc.Tallies(blanket_tallies)
+
+    # builds the openmc model
+    my_model = openmc.Model(
+        materials=materials, geometry=geometry, settings=settings, tallies=tallies
+    )
+    return ModelParts(my_model, layer_cells, surfaces, indices)
+
+
+def __getattr__(name):
+    # keeps `from openmc_model import my_model` working, built on first access
+    if name == 'my_model':
+        return build_model()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+if __name__ == '__main__':
+    export_model()
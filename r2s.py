@@ -0,0 +1,282 @@
+"""Shutdown dose rate (R2S) from the activated blanket layers.
+
+The first step is the neutron transport and the LayerActivation depletion of
+activation.py. decay_sources() reads the activated composition of every layer
+at the requested cooling times and returns its decay photon lines and
+source strength (photons/s). The second step transports those photons
+through the same geometry and scores the dose on an axisymmetric (R, Z)
+mesh with the ICRP-116 photon dose coefficients.
+
+The dose tally is split by the layer each photon was born in (CellBornFilter),
+so a run gives the dose per decay photon of every layer; the dose at a
+cooling time is then the sum over layers of that response times the layer
+source strength. The response depends only on the shape of each layer's
+decay spectrum, so cooling times whose spectra agree within a tolerance
+share one transport run (a spectral epoch) and only epochs need transport.
+
+    activation = LayerActivation.from_statepoint('statepoint.240.h5', cache_dir='micro_xs')
+    results = activation.solve(timesteps, source_rates, 'schedule_a')
+    mesh, dose = shutdown_dose(activation, results, [3600, 86400, 864000], 'r2s', cache_dir='decay_sources')
+"""
+import hashlib
+import os
+from collections import namedtuple
+
+import numpy as np
+import openmc
+import openmc.data
+
+from blanket import as_blanket, layer_radii
+from openmc_model import DEFAULT_PARAMS, R_major, build_model_parts, model_copy, r_minor, spec_hash
+
+# photon energy grid (eV) on which the decay spectra of different cooling times are compared
+SPECTRUM_BINS = np.geomspace(1e3, 2e7, 101)
+
+PSV_TO_SV_PER_H = 1e-12 * 3600
+
+# decay photon lines of one layer, intensities in photons/s
+DecaySource = namedtuple('DecaySource', ['energies', 'intensities'])
+
+
+def decay_sources(activation, results, cooling_times, cache_dir=None):
+    """Returns one {layer: DecaySource} per cooling time (s after shutdown).
+
+    `results` come from activation.solve(); shutdown is the end of the last
+    step with a non-zero source rate, and every cooling time must coincide
+    (within 1 s) with a time of the schedule. With a `cache_dir`, the lines
+    are stored there keyed by the activated composition and reused.
+    """
+    times = np.asarray(results.get_times(time_units='s'))
+    source_rates = [step.source_rate for step in results]
+    irradiated = [i for i, rate in enumerate(source_rates) if np.any(np.asarray(rate) > 0)]
+    # the final StepResult repeats the source rate of the last step, so a schedule
+    # ending under irradiation shuts down at the last time
+    shutdown = times[min(irradiated[-1] + 1, len(times) - 1)] if irradiated else times[0]
+
+    sources = []
+    for cooling_time in cooling_times:
+        steps = np.flatnonzero(np.abs(times - shutdown - cooling_time) <= 1.0)
+        if not len(steps):
+            raise ValueError(f'cooling time {cooling_time} s is not a time of the depletion schedule')
+        step = results[steps[0]]
+        sources.append({material.name: _decay_source(step.get_material(str(material.id)), material.volume, cache_dir)
+                        for material in activation.materials})
+    return sources
+
+
+def spectral_epochs(sources, tolerance=0.05):
+    """Groups cooling times whose decay spectra have the same shape.
+
+    Two cooling times share an epoch when, for every layer, their spectra
+    normalized on SPECTRUM_BINS differ by at most `tolerance` (L1 distance)
+    from the first cooling time of the epoch. Returns lists of indices into
+    `sources`, in order.
+    """
+    epochs = []
+    reference = None
+    for i, source in enumerate(sources):
+        shapes = {layer: _shape(decay) for layer, decay in source.items()}
+        if reference is not None and all(
+                np.abs(shapes[layer] - reference[layer]).sum() <= tolerance for layer in shapes):
+            epochs[-1].append(i)
+            continue
+        epochs.append([i])
+        reference = shapes
+    return epochs
+
+
+def write_epoch_source(path, sources, particles=200000, min_particles=1000, seed=1, blanket=None):
+    """Writes the photon source file of one epoch and returns the fraction of particles per layer.
+
+    `sources` are the decay sources of the epoch's cooling times. Layers
+    are sampled in proportion to their strength averaged over the epoch
+    (at least `min_particles` each); energies from the epoch-averaged lines.
+    Positions are uniform in each torus shell and directions isotropic.
+    """
+    blanket = as_blanket(blanket if blanket is not None else DEFAULT_PARAMS['blanket'])
+    edges = layer_radii(blanket, r_minor)
+    radii = {layer.name: (inner, outer) for layer, inner, outer in zip(blanket, edges, edges[1:])}
+    layers = [layer for layer in sources[0] if any(_strength(source[layer]) > 0 for source in sources)]
+    strengths = np.array([[_strength(source[layer]) for layer in layers] for source in sources])
+    totals = strengths.sum(axis=1, keepdims=True)
+    shares = np.mean(np.divide(strengths, totals, out=np.zeros_like(strengths), where=totals > 0), axis=0)
+    counts = np.maximum(np.rint(shares * particles).astype(int), min_particles)
+
+    rng = np.random.default_rng(seed)
+    particles_out = []
+    for layer, count in zip(layers, counts):
+        active = [source[layer] for source in sources if _strength(source[layer]) > 0]
+        energies = np.concatenate([decay.energies for decay in active])
+        weights = np.concatenate([decay.intensities / _strength(decay) for decay in active])
+        sampled_energies = rng.choice(energies, size=count, p=weights / weights.sum())
+        positions = _sample_shell(rng, count, *radii[layer])
+        directions = _isotropic(rng, count)
+        particles_out.extend(openmc.SourceParticle(r=r, u=u, E=E, particle=openmc.ParticleType.PHOTON)
+                             for r, u, E in zip(positions, directions, sampled_energies))
+    openmc.write_source_file(particles_out, path)
+    return dict(zip(layers, counts / counts.sum()))
+
+
+def dose_mesh(blanket=None, r_bins=100, z_bins=100):
+    """Returns an axisymmetric CylindricalMesh (one phi bin) covering the whole torus."""
+    blanket = as_blanket(blanket if blanket is not None else DEFAULT_PARAMS['blanket'])
+    outer = layer_radii(blanket, r_minor)[-1]
+    mesh = openmc.CylindricalMesh(
+        r_grid=np.linspace(R_major - outer, R_major + outer, r_bins + 1),
+        phi_grid=[0.0, 2 * np.pi],
+        z_grid=np.linspace(-outer, outer, z_bins + 1),
+    )
+    mesh.name = 'dose'
+    return mesh
+
+
+def dose_model(source_path, layers, mesh, particles=100000, batches=10, **params):
+    """Returns a photon-only copy of the model with the dose tally, and that tally.
+
+    `params` are the build_model() parameters of the activated design; the
+    tally is split by birth layer, one bin per entry of `layers`.
+    """
+    parts = build_model_parts(**params)
+    model = model_copy(**params)
+    model.settings.source = openmc.FileSource(os.path.abspath(source_path))
+    model.settings.photon_transport = True
+    model.settings.particles = particles
+    model.settings.batches = batches
+
+    energies, coefficients = openmc.data.dose_coefficients('photon', geometry='AP')
+    tally = openmc.Tally(name='dose')
+    tally.filters = [
+        openmc.MeshFilter(mesh),
+        # layer cells are filled with their material directly, so they are the cells photons are born in
+        openmc.CellBornFilter([parts.layer_cells[layer].id for layer in layers]),
+        openmc.ParticleFilter(['photon']),
+        openmc.EnergyFunctionFilter(energies, coefficients),
+    ]
+    tally.scores = ['flux']
+    model.tallies = openmc.Tallies([tally])
+    return model, tally
+
+
+def shutdown_dose(activation, results, cooling_times, directory, particles=100000, batches=10,
+                  source_particles=200000, tolerance=0.05, mesh=None, threads=None, cache_dir=None, **params):
+    """Runs the photon step for every spectral epoch and returns the mesh and the dose rates.
+
+    `params` are the build_model() parameters of the activated design.
+    Returns {cooling time: (dose rate, std_dev)} in Sv/h, each shaped (R, Z)
+    bins of `mesh`. Epoch runs are kept in `directory` and reused when their
+    source file, run settings and model parameters are unchanged.
+    """
+    if mesh is None:
+        mesh = dose_mesh(params.get('blanket'))
+    sources = decay_sources(activation, results, cooling_times, cache_dir)
+    volumes = np.asarray(mesh.volumes)[:, 0, :]
+    shape = (len(mesh.r_grid) - 1, len(mesh.z_grid) - 1)
+
+    dose = {}
+    for epoch in spectral_epochs(sources, tolerance):
+        epoch_sources = [sources[i] for i in epoch]
+        os.makedirs(directory, exist_ok=True)
+        source_path = os.path.join(directory, 'source.h5')
+        shares = write_epoch_source(source_path, epoch_sources, source_particles, blanket=params.get('blanket'))
+        layers = list(shares)
+
+        key = hashlib.sha256()
+        with open(source_path, 'rb') as fh:
+            key.update(fh.read())
+        # the source only depends on the geometry, the transport also on the materials
+        key.update(f'{particles}:{batches}:{mesh.r_grid}:{mesh.z_grid}:{spec_hash(**params)}'.encode())
+        run_directory = os.path.join(directory, f'epoch-{key.hexdigest()[:16]}')
+        os.makedirs(run_directory, exist_ok=True)
+        epoch_source = os.path.join(run_directory, 'source.h5')
+        os.replace(source_path, epoch_source)
+        statepoint = os.path.join(run_directory, f'statepoint.{batches}.h5')
+        if not os.path.exists(statepoint):
+            model, _ = dose_model(epoch_source, layers, mesh, particles, batches, **params)
+            statepoint = model.run(cwd=run_directory, threads=threads, output=False)
+
+        with openmc.StatePoint(statepoint) as sp:
+            tally = sp.get_tally(name='dose')
+            # (mesh bins in Fortran order, birth layer), pSv cm3 per source photon
+            mean = tally.mean.reshape(-1, len(layers))
+            std_dev = tally.std_dev.reshape(-1, len(layers))
+        # per decay photon of each layer, per unit volume
+        response = np.stack([mean[:, j].reshape(shape, order='F') / volumes / shares[layer]
+                             for j, layer in enumerate(layers)])
+        response_std_dev = np.stack([std_dev[:, j].reshape(shape, order='F') / volumes / shares[layer]
+                                     for j, layer in enumerate(layers)])
+
+        for i in epoch:
+            strengths = np.array([_strength(sources[i][layer]) for layer in layers])[:, None, None]
+            dose[cooling_times[i]] = (
+                PSV_TO_SV_PER_H * np.sum(strengths * response, axis=0),
+                PSV_TO_SV_PER_H * np.sqrt(np.sum((strengths * response_std_dev) ** 2, axis=0)),
+            )
+    return mesh, dose
+
+
+def _decay_source(material, volume, cache_dir):
+    path = None
+    if cache_dir is not None:
+        key = hashlib.sha256()
+        for nuclide, density in sorted(material.get_nuclide_atom_densities().items()):
+            key.update(f'{nuclide}:{density!r};'.encode())
+        key.update(f'{volume!r}:{os.path.abspath(openmc.config["chain_file"])}'.encode())
+        path = os.path.join(cache_dir, f'decay-{key.hexdigest()[:16]}.npz')
+        if os.path.exists(path):
+            with np.load(path) as data:
+                return DecaySource(data['energies'], data['intensities'])
+
+    distribution = material.get_decay_photon_energy(units='Bq', volume=volume)
+    source = DecaySource(*_lines(distribution)) if distribution is not None else DecaySource(np.zeros(0), np.zeros(0))
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(path, energies=source.energies, intensities=source.intensities)
+    return source
+
+
+def _lines(distribution, weight=1.0):
+    """Flattens a decay photon distribution into (energies, intensities).
+
+    Continuous (tabular) parts are represented by their bin midpoints.
+    """
+    if isinstance(distribution, openmc.stats.Discrete):
+        return np.asarray(distribution.x), weight * np.asarray(distribution.p)
+    if isinstance(distribution, openmc.stats.Mixture):
+        parts = [_lines(d, weight * p) for p, d in zip(distribution.probability, distribution.distribution)]
+        return np.concatenate([e for e, _ in parts]), np.concatenate([i for _, i in parts])
+    if isinstance(distribution, openmc.stats.Tabular):
+        x, p = np.asarray(distribution.x), np.asarray(distribution.p)
+        return (x[:-1] + x[1:]) / 2, weight * p[:-1] * np.diff(x)
+    raise TypeError(f'unsupported decay photon distribution {type(distribution).__name__}')
+
+
+def _strength(decay):
+    return float(np.sum(decay.intensities))
+
+
+def _shape(decay):
+    histogram, _ = np.histogram(decay.energies, SPECTRUM_BINS, weights=decay.intensities)
+    total = histogram.sum()
+    return histogram / total if total > 0 else histogram
+
+
+def _sample_shell(rng, n, inner, outer):
+    # uniform in the torus shell: minor radius with pdf ~ rho, poloidal angle ~ (R + rho cos theta)
+    rho = np.sqrt(inner ** 2 + rng.random(n) * (outer ** 2 - inner ** 2))
+    theta = np.empty(n)
+    pending = np.arange(n)
+    while len(pending):
+        trial = rng.uniform(0, 2 * np.pi, len(pending))
+        accept = rng.random(len(pending)) * (R_major + rho[pending]) < R_major + rho[pending] * np.cos(trial)
+        theta[pending[accept]] = trial[accept]
+        pending = pending[~accept]
+    phi = rng.uniform(0, 2 * np.pi, n)
+    radius = R_major + rho * np.cos(theta)
+    return np.column_stack([radius * np.cos(phi), radius * np.sin(phi), rho * np.sin(theta)])
+
+
+def _isotropic(rng, n):
+    mu = rng.uniform(-1, 1, n)
+    phi = rng.uniform(0, 2 * np.pi, n)
+    sin_theta = np.sqrt(1 - mu ** 2)
+    return np.column_stack([sin_theta * np.cos(phi), sin_theta * np.sin(phi), mu])
@@ -0,0 +1,180 @@
+"""Checkpointed production runs that survive preemption.
+
+run_resilient() writes a statepoint every `interval` batches, keeps only the
+newest `keep` of them, and when called again on the same directory resumes
+from the latest readable one with openmc.run(restart_file=...). The
+model_hash() of the model is stored next to the checkpoints and a resume
+with different parameters, or after an edit of the model code, is refused.
+
+It can also save the particles leaving the plasma chamber through the first
+wall surface (fw_inner) as a surface source, together with the number of
+crossings per source history (surface_source.json), tallied as the current
+through fw_inner out of the chamber. surface_source_model() replays that
+file, so designs that only change the outer layers do not re-track the
+chamber. Replay tallies are per banked crossing; multiplied by the
+returned scale they are per plasma neutron, like those of a full run.
+
+In the replay fw_inner is a vacuum boundary: particles scattered back into
+the chamber are killed, since their next crossings into the first wall are
+already in the file. Those re-entrant crossings were produced by the
+original layers, so the replay stays approximate for the part of the first
+wall loading that the blanket returns to the chamber.
+
+    statepoint = run_resilient('production', interval=10, keep=2, write_surface_source=True)
+    model, scale = surface_source_model('production/surface_source.h5', blanket=thicker_tank)
+"""
+import glob
+import json
+import os
+import re
+import threading
+
+import openmc
+
+from openmc_model import build_model_parts, model_copy, model_hash
+
+HASH_FILE = 'model_hash'
+SURFACE_SOURCE_FILE = 'surface_source.h5'
+SURFACE_SOURCE_SCALE_FILE = 'surface_source.json'
+
+_CURRENT_TALLY = 'surface source current'
+
+_STATEPOINT = re.compile(r'statepoint\.(\d+)\.h5')
+
+
+def run_resilient(directory, interval=10, keep=2, threads=None, write_surface_source=False,
+                  surface_source_particles=10000000, **params):
+    """Runs (or resumes) the model with periodic checkpoints; returns the final statepoint.
+
+    `params` are the build_model() parameters. `keep` must be at least 2 so
+    that a checkpoint interrupted while being written always leaves a
+    complete one behind. With `write_surface_source`, up to
+    `surface_source_particles` crossings from the chamber into the first
+    wall are saved to surface_source.h5, and the crossings per source
+    history to surface_source.json.
+    """
+    if keep < 2:
+        raise ValueError('keep at least 2 checkpoints')
+    parts = build_model_parts(**params)
+    model = model_copy(**params)
+    batches = model.settings.batches
+    model.settings.statepoint = {'batches': sorted({*range(interval, batches, interval), batches})}
+    if write_surface_source:
+        # cell 1 is the plasma chamber, surfaces[0] the first wall inner surface (fw_inner)
+        model.settings.surf_source_write = {'surface_ids': [parts.surfaces[0].id],
+                                            'max_particles': surface_source_particles,
+                                            'cellfrom': 1}
+        # every banked crossing (all particles) per source history, for the replay normalization
+        current = openmc.Tally(name=_CURRENT_TALLY)
+        current.filters = [openmc.SurfaceFilter(parts.surfaces[0].id), openmc.CellFromFilter(1)]
+        current.scores = ['current']
+        model.tallies.append(current)
+
+    os.makedirs(directory, exist_ok=True)
+    # the tallies of a restart must match, so the surface source setting is part of the hash
+    current_hash = model_hash(**params) + ('-surface_source' if write_surface_source else '')
+    hash_path = os.path.join(directory, HASH_FILE)
+    restart = latest_statepoint(directory)
+    if restart is not None:
+        if not os.path.exists(hash_path):
+            raise RuntimeError(f'{directory} holds statepoints without a {HASH_FILE}, cannot check them')
+        with open(hash_path) as fh:
+            stored_hash = fh.read().strip()
+        if stored_hash != current_hash:
+            raise RuntimeError(f'checkpoints in {directory} belong to model {stored_hash}, not {current_hash}')
+        with openmc.StatePoint(restart) as sp:
+            finished = sp.current_batch >= batches
+        if finished:
+            if write_surface_source:
+                _write_surface_source_scale(directory, restart)
+            return restart
+    else:
+        with open(hash_path, 'w') as fh:
+            fh.write(current_hash)
+
+    stop = threading.Event()
+    pruner = threading.Thread(target=_prune_until, args=(directory, keep, stop), daemon=True)
+    pruner.start()
+    try:
+        model.run(cwd=directory, threads=threads, restart_file=restart, output=False)
+    finally:
+        stop.set()
+        pruner.join()
+    prune_statepoints(directory, keep)
+    statepoint = latest_statepoint(directory)
+    if write_surface_source:
+        _write_surface_source_scale(directory, statepoint)
+    return statepoint
+
+
+def surface_source_model(source_path, **params):
+    """Returns a copy of the model that starts from a surface source written by run_resilient().
+
+    Also returns the scale (crossings per source history) that turns the
+    replay tallies into tallies per plasma neutron, read from the
+    surface_source.json next to `source_path`.
+    """
+    parts = build_model_parts(**params)
+    model = model_copy(**params)
+    # replaces the plasma source rather than adding to it
+    model.settings.source = openmc.FileSource(os.path.abspath(source_path))
+    # kills re-entrant particles, their later crossings are already in the file
+    model.geometry.get_all_surfaces()[parts.surfaces[0].id].boundary_type = 'vacuum'
+    return model, surface_source_scale(source_path)
+
+
+def surface_source_scale(source_path):
+    """Returns the crossings per source history recorded next to a surface source."""
+    path = os.path.join(os.path.dirname(os.path.abspath(source_path)), SURFACE_SOURCE_SCALE_FILE)
+    with open(path) as fh:
+        return json.load(fh)['crossings_per_history']
+
+
+def statepoints(directory):
+    """Returns the statepoints in `directory` sorted by batch, oldest first."""
+    found = []
+    for path in glob.glob(os.path.join(directory, 'statepoint.*.h5')):
+        match = _STATEPOINT.fullmatch(os.path.basename(path))
+        if match:
+            found.append((int(match.group(1)), path))
+    return [path for _, path in sorted(found)]
+
+
+def latest_statepoint(directory):
+    """Returns the newest statepoint in `directory` that can be read, or None."""
+    for path in reversed(statepoints(directory)):
+        try:
+            with openmc.StatePoint(path) as sp:
+                sp.current_batch
+        except Exception:
+            # e.g. cut off while being written
+            continue
+        return os.path.abspath(path)
+    return None
+
+
+def prune_statepoints(directory, keep):
+    """Deletes all but the newest `keep` statepoints in `directory`."""
+    for path in statepoints(directory)[:-keep]:
+        os.remove(path)
+
+
+def _write_surface_source_scale(directory, statepoint_path):
+    import h5py
+
+    with openmc.StatePoint(statepoint_path) as sp:
+        tally = sp.get_tally(name=_CURRENT_TALLY)
+        current, std_dev = float(tally.mean.sum()), float(tally.std_dev.sum())
+    with h5py.File(os.path.join(directory, SURFACE_SOURCE_FILE), 'r') as fh:
+        weights = fh['source_bank']['wgt']
+        banked, mean_weight = len(weights), float(weights.mean())
+    # FileSource samples banked sites with their weights, so divide out the mean weight
+    scale = {'crossings_per_history': current / mean_weight, 'std_dev': std_dev / mean_weight,
+             'banked': banked, 'statepoint': os.path.basename(statepoint_path)}
+    with open(os.path.join(directory, SURFACE_SOURCE_SCALE_FILE), 'w') as fh:
+        json.dump(scale, fh, indent=2)
+
+
+def _prune_until(directory, keep, stop, period=30.0):
+    while not stop.wait(period):
+        prune_statepoints(directory, keep)
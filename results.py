@@ -0,0 +1,148 @@
+"""Reads the blanket results back from a statepoint and stores them across runs.
+
+extract() opens a statepoint once and pulls every packed tally into NumPy
+arrays laid out on the named axes of its TallyIndex, then derives the
+quantities usually reported (TBR totals, layer power in W, spectra per unit
+lethargy) with array operations. ResultsStore appends those arrays, one row
+per run, to a columnar HDF5 file, so that many runs can be compared without
+re-opening their statepoints.
+
+    results = extract('statepoint.240.h5', parts.indices, fusion_power=500e6)
+    with ResultsStore('results.h5') as store:
+        store.append('reference', results)
+        tbr = store.read('tbr_total')
+"""
+import numpy as np
+import openmc
+
+from openmc_model import neutron_source_rate
+from tally_builder import SPECTRA_GROUP_STRUCTURE
+
+EV_TO_J = 1.602176634e-19
+
+
+def extract(statepoint_path, indices, fusion_power=None):
+    """Returns {column: array} for every tally of `indices` plus derived quantities.
+
+    Raw columns are the tally name ('TBR', 'heating', ...) and the same name
+    with a '_std_dev' suffix, shaped like the TallyIndex. Derived columns:
+
+    - 'tbr_total', 'tbr_layer': TBR summed over nuclides, and over layers
+    - 'heating_power': heating in W per (layer, particle, score), when
+      `fusion_power` (W) is given
+    - 'neutron_spectra_lethargy': neutron flux per unit lethargy per (layer, group)
+    """
+    results = {}
+    with openmc.StatePoint(statepoint_path) as sp:
+        for name, index in indices.items():
+            tally = sp.get_tally(name=index.name)
+            results[name] = index.reshape(tally.mean)
+            results[f'{name}_std_dev'] = index.reshape(tally.std_dev)
+
+    tbr = results['TBR'][..., 0]
+    tbr_var = results['TBR_std_dev'][..., 0] ** 2
+    results['tbr_layer'] = tbr.sum(axis=1)
+    results['tbr_layer_std_dev'] = np.sqrt(tbr_var.sum(axis=1))
+    results['tbr_total'] = tbr.sum()
+    results['tbr_total_std_dev'] = np.sqrt(tbr_var.sum())
+
+    if fusion_power is not None and 'heating' in results:
+        scale = neutron_source_rate(fusion_power) * EV_TO_J
+        results['heating_power'] = results['heating'] * scale
+        results['heating_power_std_dev'] = results['heating_std_dev'] * scale
+
+    if 'neutron_spectra' in results:
+        energies = np.asarray(openmc.mgxs.GROUP_STRUCTURES[SPECTRA_GROUP_STRUCTURE])
+        lethargy_widths = np.log(energies[1:] / energies[:-1])
+        spectra = results['neutron_spectra'][:, 0, :, 0]
+        results['neutron_spectra_lethargy'] = spectra / lethargy_widths
+        results['neutron_spectra_lethargy_std_dev'] = results['neutron_spectra_std_dev'][:, 0, :, 0] / lethargy_widths
+    return results
+
+
+def summarize(statepoint_path, indices):
+    """Returns TBR and total heating per layer (eV per source particle) as a flat dict."""
+    results = extract(statepoint_path, indices)
+    row = {'tbr': float(results['tbr_total']), 'tbr_std_dev': float(results['tbr_total_std_dev'])}
+    # heating summed over all particles; absent in radial profile mode
+    if 'heating' in results:
+        index = indices['heating']
+        heating = results['heating'][:, :, index.labels('score').index('heating')].sum(axis=1)
+        for layer, value in zip(index.labels('layer'), heating):
+            row[f'heating_{layer}'] = float(value)
+    return row
+
+
+class ResultsStore:
+    """Columnar HDF5 store with one row per run.
+
+    Every column is a dataset whose first axis is the run; the remaining
+    axes keep the shape of the extracted array, so all runs in a store must
+    share the same layers and bins. Reads only touch the requested rows.
+    """
+
+    def __init__(self, path, mode='a'):
+        import h5py
+
+        self._file = h5py.File(path, mode)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def runs(self):
+        if 'run' not in self._file:
+            return []
+        return [run.decode() for run in self._file['run'][:]]
+
+    @property
+    def columns(self):
+        return sorted(name for name in self._file if name != 'run')
+
+    def __contains__(self, run):
+        return run in self.runs
+
+    def append(self, run, results):
+        """Appends the extract() `results` of one run as a new row.
+
+        Raises ValueError, before anything is written, when the columns or
+        their shapes differ from those of the runs already stored, e.g. for a
+        blanket with another number of layers.
+        """
+        import h5py
+
+        n_runs = len(self.runs)
+        if n_runs and set(results) != set(self.columns):
+            raise ValueError(f'run {run!r} has columns {sorted(results)}, the store has {self.columns}')
+        row = {'run': np.bytes_(run), **{name: np.asarray(value) for name, value in results.items()}}
+        for name, value in row.items():
+            if name in self._file and self._file[name].shape[1:] != value.shape:
+                raise ValueError(f'run {run!r} has column {name!r} of shape {value.shape}, '
+                                 f'the store has {self._file[name].shape[1:]}')
+
+        for name, value in row.items():
+            if name not in self._file:
+                dtype = h5py.string_dtype() if name == 'run' else value.dtype
+                self._file.create_dataset(name, shape=(0, *value.shape), maxshape=(None, *value.shape),
+                                          dtype=dtype, chunks=(1, *value.shape) if value.shape else True,
+                                          compression='gzip' if value.size > 1 else None)
+            dataset = self._file[name]
+            dataset.resize(n_runs + 1, axis=0)
+            dataset[n_runs] = value
+
+    def read(self, column, runs=None):
+        """Returns `column` for the named, distinct `runs` (default: every run) as an array."""
+        dataset = self._file[column]
+        if runs is None:
+            return dataset[:]
+        positions = {run: i for i, run in enumerate(self.runs)}
+        rows = [positions[run] for run in runs]
+        order = np.argsort(rows)
+        values = dataset[np.asarray(rows)[order].tolist()]
+        return values[np.argsort(order)]
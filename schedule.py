@@ -0,0 +1,217 @@
+"""Pulsed irradiation histories for the activated blanket layers.
+
+A machine lifetime is thousands of pulse/dwell cycles grouped in campaigns
+and separated by maintenance breaks. Stepping each cycle through
+openmc.deplete would rebuild and exponentiate the burnup matrix for every
+pulse and dwell. PulsedActivation builds, once per layer, the decay matrix
+and the transmutation matrix per unit source rate from the collapsed cross
+sections of a LayerActivation, and steps the nuclide vectors itself with
+CRAM48, caching the LU factorizations for each (layer, source rate,
+timestep); a repeated pulse or dwell then costs 24 triangular solves.
+
+compress() replaces the first cycles of a long campaign by one steady step
+at the duty-averaged source rate and steps the last cycles exactly. A
+nuclide of decay constant lambda leaves the steady step off its pulsed
+trajectory by about lambda * period (relative, at most 1); the exact tail
+is sized from the decay constants of the chain so that this mismatch has
+decayed below `tolerance` for every nuclide by the end of the campaign, and
+a campaign that would need a tail as long as itself is stepped exactly.
+Nuclides with lambda * period below the tolerance see the average anyway.
+verify_compression() checks the result against exact stepping of every
+cycle.
+
+    engine = PulsedActivation(LayerActivation.from_statepoint('statepoint.240.h5'))
+    history = [Campaign(pulse=400, dwell=1400, cycles=5000, source_rate=neutron_source_rate(500e6)),
+               Break(90 * 86400)] * 3
+    summary = engine.summary(engine.solve(history))
+"""
+import math
+from collections import namedtuple
+
+import numpy as np
+import openmc.deplete
+import scipy.sparse
+import scipy.sparse.linalg
+from openmc.deplete.cram import Cram48Solver
+
+from results import EV_TO_J
+
+# `cycles` repetitions of a pulse (s) at `source_rate` (n/s) followed by a dwell (s) without source
+Campaign = namedtuple('Campaign', ['pulse', 'dwell', 'cycles', 'source_rate'])
+# a period (s) without source, e.g. a maintenance break or the final cooling
+Break = namedtuple('Break', ['duration'])
+
+# one timestep (s) at a constant source rate (n/s); `phase` is the index of the history entry it belongs to
+Step = namedtuple('Step', ['duration', 'source_rate', 'phase'])
+
+# nuclide atoms of every layer, shape (times, nuclides), at the end of each step (times in s, first entry 0)
+ScheduleResults = namedtuple('ScheduleResults', ['times', 'nuclides', 'inventories', 'phase_ends'])
+
+
+def expand(history):
+    """Returns every pulse, dwell and break of `history` as Steps."""
+    steps = []
+    for phase, entry in enumerate(history):
+        if isinstance(entry, Break):
+            steps.append(Step(entry.duration, 0.0, phase))
+        else:
+            steps.extend(_cycles(entry, entry.cycles, phase))
+    return steps
+
+
+def tail_cycles(period, decay_constants, tolerance=1e-3, min_cycles=3):
+    """Returns the number of exact cycles that end a compressed campaign of `period` s.
+
+    A nuclide with lambda * period above `tolerance` needs its mismatch
+    min(1, lambda * period) to decay below `tolerance` within the tail, i.e.
+    log2(mismatch / tolerance) half-lives; the longest such need wins.
+    """
+    cycles = min_cycles
+    for decay_constant in decay_constants:
+        mismatch = min(1.0, decay_constant * period)
+        if mismatch > tolerance:
+            half_lives = math.log2(mismatch / tolerance)
+            cycles = max(cycles, math.ceil(half_lives * math.log(2) / (decay_constant * period)))
+    return cycles
+
+
+def compress(history, decay_constants=(), tolerance=1e-3, min_tail_cycles=3):
+    """Returns the Steps of `history` with long campaigns compressed.
+
+    A campaign becomes one steady step of the leading cycles at the
+    duty-averaged source rate, followed by the last tail_cycles() cycles
+    stepped exactly, sized from `decay_constants` (1/s, e.g. those of the
+    chain) and `tolerance`. Campaigns not longer than that tail plus one
+    cycle are stepped exactly.
+    """
+    steps = []
+    for phase, entry in enumerate(history):
+        if isinstance(entry, Campaign):
+            period = entry.pulse + entry.dwell
+            tail = tail_cycles(period, decay_constants, tolerance, min_tail_cycles)
+        if isinstance(entry, Campaign) and entry.cycles > tail + 1:
+            steady = entry.cycles - tail
+            steps.append(Step(steady * period, entry.source_rate * entry.pulse / period, phase))
+            steps.extend(_cycles(entry, tail, phase))
+        elif isinstance(entry, Campaign):
+            steps.extend(_cycles(entry, entry.cycles, phase))
+        else:
+            steps.append(Step(entry.duration, 0.0, phase))
+    return steps
+
+
+def _cycles(campaign, cycles, phase):
+    steps = []
+    for _ in range(cycles):
+        steps.append(Step(campaign.pulse, campaign.source_rate, phase))
+        if campaign.dwell > 0:
+            steps.append(Step(campaign.dwell, 0.0, phase))
+    return steps
+
+
+class PulsedActivation:
+    """Burnup matrices of the layers of a LayerActivation, stepped with cached CRAM48.
+
+    The reaction rates are those of the LayerActivation: one-group cross
+    sections times the layer flux per source particle, scaled by the source
+    rate of each step.
+    """
+
+    def __init__(self, activation):
+        chain = openmc.deplete.Chain.from_xml(activation.chain_file)
+        self.layers = activation.layers
+        self.nuclides = [nuclide.name for nuclide in chain.nuclides]
+        self.decay_constants = np.array([math.log(2) / nuclide.half_life if nuclide.half_life else 0.0
+                                         for nuclide in chain.nuclides])
+        self.decay_energies = np.array([nuclide.decay_energy or 0.0 for nuclide in chain.nuclides])  # eV
+
+        self._decay, self._transmutation, self.initial = [], [], []
+        for material, flux, micro in zip(activation.materials, activation.fluxes, activation.micros):
+            # slot 0: reactions per atom per source particle (barn -> cm2, flux in n-cm/source over
+            # the volume); slot 1 stays zero and gives the decay-only matrix
+            rates = openmc.deplete.ReactionRates([material.name, 'decay'], list(micro.nuclides),
+                                                 list(micro.reactions))
+            rates[0] = micro.data[..., 0] * 1e-24 * float(np.sum(flux)) / material.volume
+            decay = chain.form_matrix(rates[1])
+            self._decay.append(scipy.sparse.csc_matrix(decay))
+            self._transmutation.append(scipy.sparse.csc_matrix(chain.form_matrix(rates[0]) - decay))
+
+            atoms = material.get_nuclide_atoms()
+            self.initial.append(np.array([atoms.get(name, 0.0) for name in self.nuclides]))
+        self._factors = {}
+
+    def matrix(self, layer, source_rate):
+        """Returns the burnup matrix (1/s) of layer number `layer` at `source_rate` (n/s)."""
+        return self._decay[layer] + source_rate * self._transmutation[layer]
+
+    def step(self, layer, atoms, duration, source_rate):
+        """Advances the nuclide vector `atoms` of layer number `layer` by one step with CRAM48."""
+        key = (layer, source_rate, duration)
+        if key not in self._factors:
+            matrix = duration * self.matrix(layer, source_rate)
+            identity = scipy.sparse.identity(matrix.shape[0], format='csc')
+            self._factors[key] = [scipy.sparse.linalg.splu((matrix - theta * identity).astype(complex).tocsc())
+                                  for theta in Cram48Solver.theta]
+        y = np.array(atoms, dtype=float)
+        for alpha, factor in zip(Cram48Solver.alpha, self._factors[key]):
+            y += 2 * np.real(alpha * factor.solve(y.astype(complex)))
+        return y * Cram48Solver.alpha0
+
+    def run(self, steps):
+        """Steps every layer through `steps` from its initial composition; returns ScheduleResults."""
+        times = np.concatenate([[0.0], np.cumsum([step.duration for step in steps])])
+        # index into times of the end of each history entry
+        phase_ends = {}
+        for i, step in enumerate(steps):
+            phase_ends[step.phase] = i + 1
+        inventories = {}
+        for i, layer in enumerate(self.layers):
+            atoms = self.initial[i]
+            history = [atoms]
+            for step in steps:
+                atoms = self.step(i, atoms, step.duration, step.source_rate)
+                history.append(atoms)
+            inventories[layer] = np.array(history)
+        return ScheduleResults(times, self.nuclides, inventories, phase_ends)
+
+    def solve(self, history, compressed=True, tolerance=1e-3):
+        """Runs an operating history (Campaign and Break entries), compressed by default.
+
+        The tails of compressed campaigns are sized from the decay constants
+        of the chain, see compress().
+        """
+        if not compressed:
+            return self.run(expand(history))
+        return self.run(compress(history, self.decay_constants, tolerance))
+
+    def summary(self, results):
+        """Returns {layer: (times in s, activity in Bq, decay heat in W)} from run() results."""
+        summary = {}
+        for layer, atoms in results.inventories.items():
+            activity = atoms * self.decay_constants
+            summary[layer] = (results.times, activity.sum(axis=1), activity @ self.decay_energies * EV_TO_J)
+        return summary
+
+
+def verify_compression(engine, history, tolerance=1e-3):
+    """Compares the compressed history with exact stepping of every cycle.
+
+    Returns {layer: (largest relative difference of activity, of decay
+    heat)} over the ends of the history entries. Meant for short schedules,
+    since exact stepping is linear in the number of cycles.
+    """
+    compressed = engine.solve(history, compressed=True, tolerance=tolerance)
+    exact = engine.solve(history, compressed=False)
+    compressed_summary, exact_summary = engine.summary(compressed), engine.summary(exact)
+    phases = sorted(exact.phase_ends)
+
+    differences = {}
+    for layer in engine.layers:
+        relative = []
+        for column in (1, 2):
+            approximate = compressed_summary[layer][column][[compressed.phase_ends[p] for p in phases]]
+            reference = exact_summary[layer][column][[exact.phase_ends[p] for p in phases]]
+            scale = np.where(reference > 0, reference, 1.0)
+            relative.append(float(np.max(np.abs(approximate - reference) / scale)))
+        differences[layer] = tuple(relative)
+    return differences
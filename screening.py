@@ -0,0 +1,102 @@
+"""Neutron-only screening runs with a calibrated heating correction.
+
+Screening runs switch photon transport off: TBR and neutron spectra are
+unaffected, and the total heating of each layer is estimated from the
+neutron 'heating-local' score, which deposits the photon energy (KERMA)
+where the photons are born. calibrate() runs the reference geometry in both
+modes once and stores, per layer, the ratio of the coupled neutron-photon
+heating to that estimate; corrected_heating() applies it, with its
+uncertainty, to screening results.
+
+    calibrate('calibration', 'heating_calibration.json')
+    model = screening_model(blanket=my_blanket)
+    heating = corrected_heating(statepoint, indices, load_calibration('heating_calibration.json'))
+"""
+import json
+import math
+import os
+
+import numpy as np
+import openmc
+
+from openmc_model import build_model_parts, model_copy, spec_hash
+
+
+def screening_model(**params):
+    """Returns a copy of the neutron-only model for the build_model() parameters `params`."""
+    return model_copy(**{**params, 'photon_transport': False})
+
+
+def screening_heating(statepoint_path, indices):
+    """Returns {layer: (heating, std_dev)} in eV/source from the neutron heating-local score."""
+    index = indices['heating']
+    with openmc.StatePoint(statepoint_path) as sp:
+        mean = index.get(sp, particle='neutron', score='heating-local')
+        std_dev = index.get(sp, value='std_dev', particle='neutron', score='heating-local')
+    return {layer: (float(m), float(s)) for layer, m, s in zip(index.labels('layer'), mean, std_dev)}
+
+
+def coupled_heating(statepoint_path, indices):
+    """Returns {layer: (heating, std_dev)} in eV/source summed over all particles."""
+    index = indices['heating']
+    with openmc.StatePoint(statepoint_path) as sp:
+        mean = index.get(sp, score='heating').sum(axis=1)
+        std_dev = np.sqrt(np.sum(index.get(sp, value='std_dev', score='heating') ** 2, axis=1))
+    return {layer: (float(m), float(s)) for layer, m, s in zip(index.labels('layer'), mean, std_dev)}
+
+
+def calibrate(directory, path, particles=100000, batches=20, threads=None, **params):
+    """Runs the coupled and the neutron-only model and stores per-layer heating corrections.
+
+    The calibration file maps every layer to the factor (coupled heating /
+    screening heating) and its standard deviation.
+    """
+    params = {**params, 'particles': particles, 'batches': batches}
+    estimates = {}
+    for mode, photon_transport in (('coupled', True), ('screening', False)):
+        parts = build_model_parts(**{**params, 'photon_transport': photon_transport})
+        run_dir = os.path.join(directory, mode)
+        os.makedirs(run_dir, exist_ok=True)
+        statepoint = parts.model.run(cwd=run_dir, threads=threads, output=False)
+        read = coupled_heating if photon_transport else screening_heating
+        estimates[mode] = read(statepoint, parts.indices)
+
+    factors = {}
+    for layer, (coupled, coupled_std_dev) in estimates['coupled'].items():
+        screening, screening_std_dev = estimates['screening'][layer]
+        factor = coupled / screening if screening else float('nan')
+        rel_err = math.hypot(_rel(coupled_std_dev, coupled), _rel(screening_std_dev, screening))
+        factors[layer] = {'factor': factor, 'std_dev': abs(factor) * rel_err}
+
+    calibration = {'reference': spec_hash(**params), 'layers': factors}
+    with open(path, 'w') as fh:
+        json.dump(calibration, fh, indent=2)
+    return calibration
+
+
+def load_calibration(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def corrected_heating(statepoint_path, indices, calibration):
+    """Returns {layer: (heating, std_dev)} of a screening run corrected with `calibration`.
+
+    The standard deviation combines the statistics of the screening run with
+    the uncertainty of the correction factor. Layers missing from the
+    calibration (e.g. in a different design) are left out.
+    """
+    corrected = {}
+    for layer, (heating, std_dev) in screening_heating(statepoint_path, indices).items():
+        if layer not in calibration['layers']:
+            continue
+        factor = calibration['layers'][layer]['factor']
+        factor_std_dev = calibration['layers'][layer]['std_dev']
+        value = heating * factor
+        rel_err = math.hypot(_rel(std_dev, heating), _rel(factor_std_dev, factor))
+        corrected[layer] = (value, abs(value) * rel_err)
+    return corrected
+
+
+def _rel(std_dev, mean):
+    return std_dev / abs(mean) if mean else float('inf')
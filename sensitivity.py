@@ -0,0 +1,196 @@
+"""First-order sensitivities of TBR and layer heating from a single run.
+
+OpenMC differential tallies (openmc.TallyDerivative) give the derivative of
+a tally with respect to a material density or a nuclide density, but only
+for a few scores; (n,Xt) and heating are not among them. The neutron flux
+is, so every metric M = sum_g r_g phi_g is differentiated through its
+group-wise flux (VITAMIN-J-175 groups, per layer):
+
+    dM/dp = sum_g (R_g / phi_g) dphi_g/dp + direct term
+
+where the indirect term uses the flux derivative tallies and the direct
+term is the change of the reaction rate itself (R_X / N_X for a nuclide
+density, R / rho for a material density) in the layers made of the
+perturbed material. The group-collapsed ratios are taken as exact, so the
+uncertainties only carry the statistics of the derivative tallies and the
+direct term. Heating is the neutron heating; the photon contribution is not
+differentiated.
+
+    model, setup = sensitivity_model(particles=100000, batches=50)
+    statepoint = model.run(cwd='sensitivity')
+    sens = design_sensitivities(sensitivities(statepoint, setup), setup)
+    tbr_at_95 = extrapolate(sens, {'li6_enrichment': 0.05})['TBR']
+"""
+from collections import namedtuple
+
+import numpy as np
+import openmc
+
+from openmc_model import build_model_parts, model_copy
+from tally_builder import SPECTRA_GROUP_STRUCTURE, TallyIndex
+
+# (name, OpenMC derivative variable, material name, nuclide)
+Derivative = namedtuple('Derivative', ['name', 'variable', 'material', 'nuclide'], defaults=[None])
+
+DEFAULT_DERIVATIVES = (
+    Derivative('Li6', 'nuclide_density', 'molten_salt', 'Li6'),
+    Derivative('Li7', 'nuclide_density', 'molten_salt', 'Li7'),
+    Derivative('flibe_density', 'density', 'molten_salt'),
+    Derivative('be_density', 'density', 'neutron_multiplier'),
+)
+
+# everything sensitivities() needs to read the run back
+SensitivitySetup = namedtuple('SensitivitySetup', ['derivatives', 'indices', 'layer_materials', 'nuclide_densities',
+                                                   'mass_densities'])
+
+
+def sensitivity_model(derivatives=DEFAULT_DERIVATIVES, **params):
+    """Returns a copy of the model with the tallies needed for the sensitivities, and its setup.
+
+    `params` are the build_model() parameters of the design point.
+    """
+    parts = build_model_parts(**params)
+    model = model_copy(**params)
+    materials = {material.name: material for material in model.materials}
+    cells = parts.layer_cells
+    tbr_layers = parts.indices['TBR'].labels('layer')
+    nuclides = sorted({derivative.nuclide for derivative in derivatives if derivative.nuclide is not None})
+
+    energy_bins = openmc.mgxs.GROUP_STRUCTURES[SPECTRA_GROUP_STRUCTURE]
+    groups = range(len(energy_bins) - 1)
+    energy_filter = openmc.EnergyFilter(energy_bins)
+    layer_filter = openmc.CellFilter(list(cells.values()))
+    neutron_filter = openmc.ParticleFilter(['neutron'])
+
+    tbr_tally = openmc.Tally(name='sensitivity TBR')
+    tbr_tally.filters = [openmc.CellFilter([cells[layer] for layer in tbr_layers]), energy_filter]
+    tbr_tally.nuclides = ['Li6', 'Li7']
+    tbr_tally.scores = ['(n,Xt)']
+
+    heating_tally = openmc.Tally(name='sensitivity heating')
+    heating_tally.filters = [layer_filter, neutron_filter, energy_filter]
+    heating_tally.nuclides = ['total', *nuclides]
+    heating_tally.scores = ['heating']
+    model.tallies += [tbr_tally, heating_tally]
+
+    indices = {
+        'flux': parts.indices['neutron_spectra'],
+        'TBR': TallyIndex(tbr_tally.name, [('layer', tbr_layers), ('group', groups), ('nuclide', ['Li6', 'Li7']),
+                                           ('score', ['(n,Xt)'])]),
+        'heating': TallyIndex(heating_tally.name, [('layer', cells), ('particle', ['neutron']), ('group', groups),
+                                                   ('nuclide', ['total', *nuclides]), ('score', ['heating'])]),
+    }
+    for derivative in derivatives:
+        tally = openmc.Tally(name=f'sensitivity flux d{derivative.name}')
+        tally.filters = [layer_filter, neutron_filter, energy_filter]
+        tally.scores = ['flux']
+        tally.derivative = openmc.TallyDerivative(variable=derivative.variable,
+                                                  material=materials[derivative.material].id,
+                                                  nuclide=derivative.nuclide)
+        model.tallies.append(tally)
+        indices[f'd{derivative.name}'] = TallyIndex(tally.name, parts.indices['neutron_spectra'].axes)
+
+    setup = SensitivitySetup(
+        derivatives=tuple(derivatives),
+        indices=indices,
+        layer_materials={layer: cell.fill.name for layer, cell in cells.items()},
+        nuclide_densities={name: material.get_nuclide_atom_densities() for name, material in materials.items()},
+        mass_densities={name: material.get_mass_density() for name, material in materials.items()},
+    )
+    return model, setup
+
+
+def sensitivities(statepoint_path, setup):
+    """Returns {metric: {'value': (mean, std_dev), derivative name: (dM/dp, std_dev)}}.
+
+    Metrics are 'TBR' (all breeding layers) and 'heating <layer>' (neutron
+    heating in eV/source). Derivatives are per unit of the OpenMC variable:
+    atom/b-cm for nuclide densities, g/cm3 for material densities.
+    """
+    with openmc.StatePoint(statepoint_path) as sp:
+        flux = setup.indices['flux'].get(sp)[:, 0, :, 0]
+        tbr = setup.indices['TBR'].get(sp)[..., 0]
+        tbr_std_dev = setup.indices['TBR'].get(sp, value='std_dev')[..., 0]
+        heating = setup.indices['heating'].get(sp)[:, 0, :, :, 0]
+        heating_std_dev = setup.indices['heating'].get(sp, value='std_dev')[:, 0, :, :, 0]
+        flux_derivatives = {d.name: (setup.indices[f'd{d.name}'].get(sp)[:, 0, :, 0],
+                                     setup.indices[f'd{d.name}'].get(sp, value='std_dev')[:, 0, :, 0])
+                            for d in setup.derivatives}
+
+    layers = setup.indices['flux'].labels('layer')
+    tbr_layers = setup.indices['TBR'].labels('layer')
+    tbr_rows = [layers.index(layer) for layer in tbr_layers]
+    heating_nuclides = setup.indices['heating'].labels('nuclide')
+
+    # metric name -> (layer rows, group-wise rate (layers, groups), its std_dev, per-nuclide rates or None)
+    metrics = {'TBR': (tbr_rows, tbr.sum(axis=-1), np.sqrt(np.sum(tbr_std_dev ** 2, axis=-1)),
+                       dict(zip(['Li6', 'Li7'], np.moveaxis(tbr, -1, 0))))}
+    for i, layer in enumerate(layers):
+        nuclide_rates = {nuclide: heating[i:i + 1, :, k] for k, nuclide in enumerate(heating_nuclides) if k}
+        metrics[f'heating {layer}'] = ([i], heating[i:i + 1, :, 0], heating_std_dev[i:i + 1, :, 0], nuclide_rates)
+
+    results = {}
+    for metric, (rows, rate, rate_std_dev, nuclide_rates) in metrics.items():
+        group_flux = flux[rows]
+        ratio = np.divide(rate, group_flux, out=np.zeros_like(rate), where=group_flux > 0)
+        entry = {'value': (float(rate.sum()), float(np.sqrt(np.sum(rate_std_dev ** 2))))}
+        for derivative in setup.derivatives:
+            d_flux, d_flux_std_dev = flux_derivatives[derivative.name]
+            value = np.sum(ratio * d_flux[rows])
+            variance = np.sum((ratio * d_flux_std_dev[rows]) ** 2)
+            # direct term: the reaction rate itself scales with the perturbed density
+            in_material = np.array([setup.layer_materials[layers[row]] == derivative.material for row in rows])
+            if derivative.variable == 'density':
+                scale = 1.0 / setup.mass_densities[derivative.material]
+                direct = rate[in_material] * scale
+                direct_std_dev = rate_std_dev[in_material] * scale
+            else:
+                density = setup.nuclide_densities[derivative.material].get(derivative.nuclide, 0.0)
+                nuclide_rate = nuclide_rates.get(derivative.nuclide)
+                if nuclide_rate is None or density == 0.0:
+                    direct = direct_std_dev = np.zeros(0)
+                else:
+                    direct = nuclide_rate[in_material] / density
+                    direct_std_dev = np.zeros_like(direct)
+            value += direct.sum()
+            variance += np.sum(direct_std_dev ** 2)
+            entry[derivative.name] = (float(value), float(np.sqrt(variance)))
+        results[metric] = entry
+    return results
+
+
+def design_sensitivities(results, setup):
+    """Converts sensitivities() results to the build_model() design parameters.
+
+    Returns {metric: {'value': ..., 'li6_enrichment': ..., 'flibe_density': ...,
+    'be_density': ...}} for the parameters whose derivatives were tallied.
+    Enrichment keeps the lithium atom density: dM/de = N_Li (dM/dN_Li6 - dM/dN_Li7).
+    """
+    names = {derivative.name for derivative in setup.derivatives}
+    lithium = sum(setup.nuclide_densities['molten_salt'].get(nuclide, 0.0) for nuclide in ('Li6', 'Li7'))
+    converted = {}
+    for metric, entry in results.items():
+        design = {'value': entry['value']}
+        if {'Li6', 'Li7'} <= names:
+            (d6, s6), (d7, s7) = entry['Li6'], entry['Li7']
+            design['li6_enrichment'] = (lithium * (d6 - d7), lithium * float(np.hypot(s6, s7)))
+        for name in ('flibe_density', 'be_density'):
+            if name in names:
+                design[name] = entry[name]
+        converted[metric] = design
+    return converted
+
+
+def extrapolate(results, changes):
+    """Returns {metric: first-order estimate} at the design point moved by `changes`.
+
+    `changes` maps derivative (or design parameter) names to the change of
+    that variable, in the units of the derivative.
+    """
+    estimates = {}
+    for metric, entry in results.items():
+        estimate = entry['value'][0]
+        for name, change in changes.items():
+            estimate += entry[name][0] * change
+        estimates[metric] = estimate
+    return estimates
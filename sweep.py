@@ -0,0 +1,152 @@
+"""Runs many blanket designs in parallel on a local process pool.
+
+Each case is a dict of build_model() parameters. Cases run in their own
+directory named after spec_hash() of their (budget-capped) parameters, and a
+case whose directory already holds a result is not run again.
+
+    from blanket import DEFAULT_BLANKET, Layer
+    from sweep import run_sweep
+
+    cases = []
+    for thickness in (50, 75, 100):
+        blanket = [layer if layer.name != 'flibe2' else layer._replace(thickness=thickness)
+                   for layer in DEFAULT_BLANKET]
+        cases.append({'blanket': blanket})
+    rows = run_sweep(cases, 'sweep', max_histories=10**7)
+"""
+import concurrent.futures
+import csv
+import glob
+import json
+import os
+import warnings
+
+from blanket import as_blanket
+from openmc_model import DEFAULT_PARAMS, spec_hash
+
+RESULT_FILE = 'result.json'
+
+
+def cap_budget(params, max_histories):
+    """Limits particles x batches of a case to `max_histories`, fewer batches first."""
+    params = dict(params)
+    particles = params.get('particles', DEFAULT_PARAMS['particles'])
+    batches = params.get('batches', DEFAULT_PARAMS['batches'])
+    if max_histories is not None and particles * batches > max_histories:
+        particles = min(particles, max_histories)
+        batches = max(1, max_histories // particles)
+    params['particles'] = particles
+    params['batches'] = batches
+    return params
+
+
+def run_case(params, directory, threads=1):
+    """Runs a single case in `directory` and returns its result row."""
+    from openmc_model import build_model_parts
+    from results import summarize
+
+    parts = build_model_parts(**params)
+    os.makedirs(directory, exist_ok=True)
+    statepoint = parts.model.run(cwd=directory, threads=threads, output=False)
+    layers = as_blanket(params.get('blanket', DEFAULT_PARAMS['blanket']))
+    row = {'hash': spec_hash(**params), 'layers': _describe_blanket(layers), **summarize(statepoint, parts.indices)}
+    with open(os.path.join(directory, RESULT_FILE), 'w') as fh:
+        json.dump({'params': params, 'statepoint': str(statepoint), 'row': row}, fh, indent=2)
+    return row
+
+
+def run_sweep(cases, directory='sweep', max_workers=None, max_histories=None, threads=1, table='results.csv',
+              store=None, fusion_power=None):
+    """Runs every case of `cases` and collects one result row per case.
+
+    Up to `max_workers` cases (default: CPU count / threads) run at the same
+    time, each with `threads` OpenMC threads. `max_histories` caps the
+    particles x batches of every case. The rows are returned in case order
+    and written to `table` (a CSV file inside `directory`). With a `store`
+    path, the full extract() arrays of every case not yet stored there are
+    appended to that ResultsStore under the case hash; cases whose arrays do
+    not match the store's shapes are left out with a warning, so sweep
+    designs with another number of layers into a separate store.
+    """
+    if max_workers is None:
+        max_workers = max(1, (os.cpu_count() or 1) // threads)
+    os.makedirs(directory, exist_ok=True)
+
+    rows = {}
+    pending = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for i, case in enumerate(cases):
+            params = cap_budget(case, max_histories)
+            case_dir = os.path.join(directory, spec_hash(**params))
+            previous = _load_result(case_dir)
+            if previous is not None:
+                rows[i] = previous
+            else:
+                pending[pool.submit(run_case, params, case_dir, threads)] = i
+        for future in concurrent.futures.as_completed(pending):
+            rows[pending[future]] = future.result()
+
+    rows = [rows[i] for i in sorted(rows)]
+    if table and rows:
+        _write_table(rows, os.path.join(directory, table))
+    if store is not None:
+        _store_results(cases, directory, max_histories, store, fusion_power)
+    return rows
+
+
+def _store_results(cases, directory, max_histories, store, fusion_power):
+    # HDF5 is written from this process only, after the workers are done
+    from openmc_model import build_model_parts
+    from results import ResultsStore, extract
+
+    with ResultsStore(store) as results_store:
+        stored = set(results_store.runs)
+        for case in cases:
+            params = cap_budget(case, max_histories)
+            run = spec_hash(**params)
+            if run in stored:
+                continue
+            statepoint = _find_statepoint(os.path.join(directory, run))
+            if statepoint is None:
+                warnings.warn(f'not storing case {run}: no statepoint found in {os.path.join(directory, run)}')
+                continue
+            indices = build_model_parts(**params).indices
+            try:
+                results_store.append(run, extract(statepoint, indices, fusion_power))
+            except ValueError as error:
+                # e.g. a blanket with another number of layers than the runs already stored
+                warnings.warn(f'not storing case {run}: {error}')
+                continue
+            stored.add(run)
+
+
+def _find_statepoint(case_dir):
+    # result files written before the statepoint path was recorded lack the key
+    with open(os.path.join(case_dir, RESULT_FILE)) as fh:
+        statepoint = json.load(fh).get('statepoint')
+    if statepoint is not None and os.path.exists(statepoint):
+        return statepoint
+    found = glob.glob(os.path.join(case_dir, 'statepoint.*.h5'))
+    if not found:
+        return None
+    return max(found, key=lambda path: int(os.path.basename(path).split('.')[1]))
+
+
+def _load_result(case_dir):
+    path = os.path.join(case_dir, RESULT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as fh:
+        return json.load(fh)['row']
+
+
+def _describe_blanket(layers):
+    return ' '.join(f'{layer.name}:{layer.thickness:g}:{layer.material}' for layer in layers)
+
+
+def _write_table(rows, path):
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    with open(path, 'w', newline='') as fh:
+        writer = csv.DictWriter(fh, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
@@ -0,0 +1,168 @@
+"""Generates packed tallies for the layered blanket.
+
+Instead of one tally per (cell, particle, score) combination, every layer,
+particle and score is folded into the filters and scores of a single tally.
+A TallyIndex keeps the results addressable by their labels.
+"""
+import numpy as np
+import openmc
+
+PARTICLES = ('neutron', 'photon', 'electron', 'positron')
+HEATING_SCORES = ('heating', 'heating-local')
+BREEDING_NUCLIDES = ('Li6', 'Li7')
+SPECTRA_GROUP_STRUCTURE = 'VITAMIN-J-175'
+PROFILE_SCORES = ('heating', 'heating-local', 'flux')
+
+# short particle labels used by the historical one-tally-per-bin names
+_LEGACY_PARTICLE_LABELS = {'neutron': 'n', 'photon': 'photon', 'electron': 'electron', 'positron': 'positron'}
+
+
+class TallyIndex:
+    """Named axes of a packed tally.
+
+    `axes` is a sequence of (axis name, labels) pairs in the order of the
+    tally filters, followed by the nuclide axis (if any) and the score axis,
+    i.e. the C-order layout of `openmc.Tally.mean`.
+    """
+
+    def __init__(self, name, axes):
+        self.name = name
+        self.axes = [(axis, list(labels)) for axis, labels in axes]
+
+    def __repr__(self):
+        axes = ', '.join(f'{axis}={len(labels)}' for axis, labels in self.axes)
+        return f'TallyIndex({self.name!r}, {axes})'
+
+    @property
+    def shape(self):
+        return tuple(len(labels) for _, labels in self.axes)
+
+    def labels(self, axis):
+        for name, labels in self.axes:
+            if name == axis:
+                return labels
+        raise KeyError(f'tally {self.name!r} has no axis {axis!r}')
+
+    def position(self, **labels):
+        """Returns the index tuple for the given labels; omitted axes are kept whole."""
+        unknown = set(labels) - {axis for axis, _ in self.axes}
+        if unknown:
+            raise KeyError(f'tally {self.name!r} has no axis {sorted(unknown)}')
+        position = []
+        for axis, axis_labels in self.axes:
+            if axis in labels:
+                position.append(axis_labels.index(labels[axis]))
+            else:
+                position.append(slice(None))
+        return tuple(position)
+
+    def reshape(self, values):
+        """Reshapes a (bins, nuclides, scores) tally array onto the named axes."""
+        return np.reshape(values, self.shape)
+
+    def get(self, statepoint, value='mean', **labels):
+        """Reads `value` ('mean', 'std_dev', 'sum', ...) for the given labels from a statepoint."""
+        tally = statepoint.get_tally(name=self.name)
+        return self.reshape(getattr(tally, value))[self.position(**labels)]
+
+
+def build_heating_tallies(cells, particles=PARTICLES, scores=HEATING_SCORES, name='heating'):
+    """Builds the heating tallies for all layers at once.
+
+    `cells` maps layer names to cells, in radial order. Returns the list of
+    tallies (a single one) and the TallyIndex addressing it by
+    (layer, particle, score).
+    """
+    tally = openmc.Tally(name=name)
+    tally.filters = [openmc.CellFilter(list(cells.values())), openmc.ParticleFilter(list(particles))]
+    tally.scores = list(scores)
+    index = TallyIndex(name, [('layer', cells), ('particle', particles), ('score', scores)])
+    return [tally], index
+
+
+def build_legacy_heating_tallies(cells, particles=PARTICLES, scores=HEATING_SCORES):
+    """Builds the historical one-tally-per-(layer, particle, score) layout.
+
+    Only kept so that benchmarks can compare against the packed layout; the
+    names match the ones used before the tallies were packed.
+    """
+    tallies = []
+    particle_filters = {particle: openmc.ParticleFilter([particle]) for particle in particles}
+    for layer, cell in cells.items():
+        cell_filter = openmc.CellFilter(cell)
+        for score in scores:
+            for particle in particles:
+                label = _LEGACY_PARTICLE_LABELS.get(particle, particle)
+                if score == 'heating':
+                    name = f'heating {layer} {label}'
+                else:
+                    name = f'heating {layer} tot {label}'
+                tally = openmc.Tally(name=name)
+                tally.scores = [score]
+                tally.filters = [cell_filter, particle_filters[particle]]
+                tallies.append(tally)
+    return tallies
+
+
+def build_radial_profile_tallies(mesh, r_centers, z_centers, particles=PARTICLES, scores=PROFILE_SCORES,
+                                 name='radial_profile'):
+    """Builds a single mesh tally scoring every particle and score on an axisymmetric (R, Z) mesh.
+
+    `mesh` is a CylindricalMesh with one phi bin and `r_centers`, `z_centers`
+    label its bins. Returns the list of tallies (a single one) and the
+    TallyIndex addressing it by (z, r, particle, score); OpenMC orders the
+    mesh bins with R varying fastest.
+    """
+    tally = openmc.Tally(name=name)
+    tally.filters = [openmc.MeshFilter(mesh), openmc.ParticleFilter(list(particles))]
+    tally.scores = list(scores)
+    index = TallyIndex(name, [('z', z_centers), ('r', r_centers), ('particle', particles), ('score', scores)])
+    return [tally], index
+
+
+def build_blanket_tallies(cells, breeding_layers, particles=PARTICLES, heating_scores=HEATING_SCORES,
+                          layer_heating=True):
+    """Builds the full tally set of the blanket from its layers.
+
+    `cells` maps layer names to cells in radial order and `breeding_layers`
+    names the layers scored for tritium production. Returns the tallies and
+    a {tally name: TallyIndex} mapping:
+
+    - 'TBR': (n,Xt) from Li6 and Li7 in every breeding layer
+    - 'flux': flux of every particle in every layer
+    - 'heating': see build_heating_tallies()
+    - 'neutron_spectra': neutron flux in every layer on the VITAMIN-J-175 groups
+
+    With `layer_heating=False` the per-layer flux and heating tallies are
+    left out, e.g. when a radial profile tally replaces them.
+    """
+    layer_filter = openmc.CellFilter(list(cells.values()))
+    neutron_filter = openmc.ParticleFilter(['neutron'])
+    energy_bins = openmc.mgxs.GROUP_STRUCTURES[SPECTRA_GROUP_STRUCTURE]
+    energy_filter = openmc.EnergyFilter(energy_bins)
+
+    # makes a tally to distinguish tritium production from Li6 and Li7
+    breeding_cells = [cells[layer] for layer in breeding_layers]
+    tbr_tally = openmc.Tally(name='TBR')
+    tbr_tally.filters = [openmc.CellFilter(breeding_cells)]
+    tbr_tally.nuclides = list(BREEDING_NUCLIDES)
+    tbr_tally.scores = ['(n,Xt)']
+
+    spectra_tally = openmc.Tally(name='neutron_spectra')
+    spectra_tally.filters = [layer_filter, neutron_filter, energy_filter]
+    spectra_tally.scores = ['flux']
+
+    tallies = [tbr_tally, spectra_tally]
+    indices = {
+        'TBR': TallyIndex('TBR', [('layer', breeding_layers), ('nuclide', BREEDING_NUCLIDES), ('score', ['(n,Xt)'])]),
+        'neutron_spectra': TallyIndex('neutron_spectra', [('layer', cells), ('particle', ['neutron']),
+                                                          ('group', range(len(energy_bins) - 1)), ('score', ['flux'])]),
+    }
+    if layer_heating:
+        flux_tally = openmc.Tally(name='flux')
+        flux_tally.filters = [layer_filter, openmc.ParticleFilter(list(particles))]
+        flux_tally.scores = ['flux']
+        heating_tallies, indices['heating'] = build_heating_tallies(cells, particles, heating_scores)
+        indices['flux'] = TallyIndex('flux', [('layer', cells), ('particle', particles), ('score', ['flux'])])
+        tallies[1:1] = [flux_tally, *heating_tallies]
+    return tallies, indices
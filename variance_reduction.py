@@ -0,0 +1,131 @@
+"""Weight windows for the deep layers of the blanket.
+
+The 100 cm FLiBe tank shields the outer structure so well that the analog
+tallies behind it (heating and flux in flibe2 and str3) get few scores.
+generate_weight_windows() runs a short pass with OpenMC's weight-window
+generator (MAGIC method) on a mesh covering the whole torus and saves the
+windows to an HDF5 file; weighted_model() loads them for production runs.
+figure_of_merit_report() compares the outer-layer tallies of an analog and
+a weighted run.
+
+    generate_weight_windows('weight_windows.h5', 'ww_run')
+    weighted = weighted_model('weight_windows.h5', particles=200000, batches=50)
+"""
+import os
+import shutil
+
+import numpy as np
+import openmc
+
+from blanket import as_blanket, layer_radii
+from openmc_model import DEFAULT_PARAMS, R_major, model_copy, r_minor
+
+OUTER_LAYERS = ('flibe2', 'str3')
+
+
+def torus_mesh(blanket=DEFAULT_PARAMS['blanket'], r_bins=60, z_bins=60):
+    """Returns an axisymmetric CylindricalMesh enclosing the whole torus."""
+    r_outer = layer_radii(as_blanket(blanket), r_minor)[-1]
+    mesh = openmc.CylindricalMesh(
+        r_grid=np.linspace(max(R_major - r_outer, 0.0), R_major + r_outer, r_bins + 1),
+        z_grid=np.linspace(-r_outer, r_outer, z_bins + 1),
+        phi_grid=[0.0, 2 * np.pi],
+    )
+    mesh.name = 'torus'
+    return mesh
+
+
+def generate_weight_windows(path, directory, mesh=None, particles=100000, batches=20, threads=None, **params):
+    """Generates weight windows with a short run and saves them to `path`.
+
+    The windows are built for neutrons, and for photons when photon transport
+    is on, on `mesh` (default: torus_mesh()) and updated after every batch.
+    `params` are the build_model() parameters of the production model.
+    """
+    model = model_copy(**params)
+    if mesh is None:
+        mesh = torus_mesh(params.get('blanket', DEFAULT_PARAMS['blanket']))
+
+    particle_types = ['neutron', 'photon'] if model.settings.photon_transport else ['neutron']
+    model.settings.particles = particles
+    model.settings.batches = batches
+    model.settings.weight_window_generators = [
+        openmc.WeightWindowGenerator(mesh, particle_type=particle_type, method='magic',
+                                     max_realizations=batches, update_interval=1, on_the_fly=True)
+        for particle_type in particle_types
+    ]
+    # only the windows are of interest here, not the production tallies
+    model.tallies = openmc.Tallies()
+
+    os.makedirs(directory, exist_ok=True)
+    model.run(cwd=directory, threads=threads, output=False)
+    generated = os.path.join(directory, 'weight_windows.h5')
+    if not os.path.exists(generated):
+        raise RuntimeError(f'OpenMC did not write {generated}')
+    shutil.copyfile(generated, path)
+    return path
+
+
+def weighted_model(path, **params):
+    """Returns a copy of the model that applies the weight windows saved in `path`."""
+    model = model_copy(**params)
+    model.settings.weight_windows = openmc.hdf5_to_wws(path)
+    model.settings.weight_windows_on = True
+    return model
+
+
+def figure_of_merit_report(analog_statepoint, weighted_statepoint, indices, layers=OUTER_LAYERS):
+    """Compares FOM = 1 / (R^2 T) of the outer-layer tallies of two runs.
+
+    T is the transport time of each run. `indices` are the tally indices of
+    the model. Heating is summed over particles, flux is given per
+    particle. Returns one dict per quantity with the relative errors,
+    figures of merit and their ratio.
+    """
+    analog = _outer_layer_errors(analog_statepoint, indices, layers)
+    weighted = _outer_layer_errors(weighted_statepoint, indices, layers)
+    rows = []
+    for key, (analog_rel_err, analog_time) in analog.items():
+        weighted_rel_err, weighted_time = weighted[key]
+        analog_fom = _figure_of_merit(analog_rel_err, analog_time)
+        weighted_fom = _figure_of_merit(weighted_rel_err, weighted_time)
+        rows.append({
+            'layer': key[0], 'quantity': key[1],
+            'rel_err_analog': analog_rel_err, 'rel_err_weighted': weighted_rel_err,
+            'fom_analog': analog_fom, 'fom_weighted': weighted_fom,
+            'fom_ratio': _ratio(weighted_fom, analog_fom),
+        })
+    return rows
+
+
+def _outer_layer_errors(statepoint_path, indices, layers):
+    heating_index, flux_index = indices['heating'], indices['flux']
+    errors = {}
+    with openmc.StatePoint(statepoint_path) as sp:
+        # transport only: initialization and cross-section loading would dilute the FOM ratio
+        time = sp.runtime.get('transport', sp.runtime['simulation'])
+        for layer in layers:
+            for score in heating_index.labels('score'):
+                mean = heating_index.get(sp, layer=layer, score=score).sum()
+                std_dev = np.sqrt(np.sum(heating_index.get(sp, value='std_dev', layer=layer, score=score) ** 2))
+                errors[layer, f'{score} (all particles)'] = (_rel_err(mean, std_dev), time)
+            for particle in flux_index.labels('particle'):
+                mean = flux_index.get(sp, layer=layer, particle=particle).sum()
+                std_dev = flux_index.get(sp, value='std_dev', layer=layer, particle=particle).sum()
+                errors[layer, f'{particle} flux'] = (_rel_err(mean, std_dev), time)
+    return errors
+
+
+def _rel_err(mean, std_dev):
+    return float(std_dev / abs(mean)) if mean != 0 else float('inf')
+
+
+def _figure_of_merit(rel_err, time):
+    return 1.0 / (rel_err ** 2 * time) if 0 < rel_err < float('inf') else 0.0
+
+
+def _ratio(weighted_fom, analog_fom):
+    if analog_fom:
+        return weighted_fom / analog_fom
+    # the analog run did not score at all
+    return float('inf') if weighted_fom else float('nan')